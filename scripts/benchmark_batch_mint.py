@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from starkware.starknet.definitions.error_codes import StarknetErrorCode  # noqa: E402
+from starkware.starknet.public.abi import get_storage_var_address  # noqa: E402
+from starkware.starknet.testing.starknet import Starknet  # noqa: E402
+from starkware.starkware_utils.error_handling import StarkException  # noqa: E402
+
+from ino_deployment import (  # noqa: E402
+    admin1, deploy_contracts, get_contract_defs, sale_participant, sig_exp, sign_registration,
+)
+from measure import fit_line, send_measured  # noqa: E402
+from utils import (  # noqa: E402
+    cached_contract, fork_state, get_state_snapshots, set_block_timestamp, to_uint,
+)
+
+# low enough for the 50000 ETH the participant of the tests holds to pay for any claim
+TOKEN_PRICE = to_uint(10**18)
+
+
+async def setup_ino(max_claim):
+    """
+    Deploys the contracts of the INO tests (restoring its state snapshot),
+    sets up a sale of `max_claim` ERC721 tokens and registers the participant
+    of the tests. Returns the state at the start of the purchase round.
+    """
+    contract_defs = get_contract_defs()
+    starknet = await Starknet.empty()
+    day = datetime.today()
+    set_block_timestamp(starknet.state, int(day.timestamp()))
+    contracts = await get_state_snapshots().restore_or_deploy(starknet, contract_defs, deploy_contracts)
+    admin, owner, participant, ino, erc20_eth_token, erc721_token = (
+        contracts[1], contracts[3], contracts[4], contracts[8], contracts[9], contracts[10])
+
+    sale_end = day + timedelta(days=90)
+    token_unlock = sale_end + timedelta(weeks=1)
+    await admin1.send_transaction(admin, ino.contract_address, "set_sale_params", [
+        erc721_token.contract_address,
+        owner.contract_address,
+        *TOKEN_PRICE,
+        *to_uint(max_claim),
+        int(sale_end.timestamp()),
+        int(token_unlock.timestamp()),
+    ])
+    registration_start = day + timedelta(days=1)
+    registration_end = registration_start + timedelta(weeks=1)
+    await admin1.send_transaction(admin, ino.contract_address, "set_registration_time", [
+        int(registration_start.timestamp()), int(registration_end.timestamp())])
+    purchase_round_start = registration_end + timedelta(days=1)
+    await admin1.send_transaction(admin, ino.contract_address, "set_purchase_round_params", [
+        int(purchase_round_start.timestamp()),
+        int((purchase_round_start + timedelta(weeks=1)).timestamp()),
+        *to_uint(max_claim),
+    ])
+
+    set_block_timestamp(starknet.state, int(registration_start.timestamp()) + 1)
+    signature = sign_registration(sig_exp, participant.contract_address, ino.contract_address, admin1.signer)
+    await sale_participant.send_transaction(
+        participant, ino.contract_address, "register_user", [len(signature), *signature, sig_exp])
+
+    set_block_timestamp(starknet.state, int(purchase_round_start.timestamp()) + 1)
+    await sale_participant.send_transaction(participant, erc20_eth_token.contract_address, "approve", [
+        ino.contract_address, *to_uint(max_claim * TOKEN_PRICE[0])])
+
+    # withdraw_tokens is open once the tokens are unlocked
+    withdraw_time = int(token_unlock.timestamp()) + 24 * 60 * 60 + 60
+    return starknet.state, contract_defs[0], participant, ino, withdraw_time
+
+
+async def claim(setup, amount, step_limit=None):
+    """
+    Buys `amount` tokens and withdraws them, on a fork of the state of
+    `setup_ino`, minting `amount` ERC721 in a single withdraw_tokens.
+    Returns the measures of withdraw_tokens.
+
+    A registration wins a single token, the participant's IDO_winners count
+    is set to `amount` in the fork so that it can buy them all.
+    """
+    state, account_def, participant, ino, withdraw_time = setup
+    fork = fork_state(state)
+    await fork.state.set_storage_at(
+        ino.contract_address, get_storage_var_address("IDO_winners", participant.contract_address), amount)
+    await sale_participant.send_transaction(
+        cached_contract(fork, account_def, participant), ino.contract_address, "participate",
+        [*to_uint(amount * TOKEN_PRICE[0])])
+
+    set_block_timestamp(fork, withdraw_time)
+    if step_limit is not None:
+        fork.general_config = dataclasses.replace(fork.general_config, invoke_tx_max_n_steps=step_limit)
+    _, tx, measures = await send_measured(
+        fork, sale_participant, account_def, participant, ino.contract_address, "withdraw_tokens", [1])
+    return {"amount": amount, **measures, "execute_n_steps": tx.call_info.execution_resources.n_steps}
+
+
+async def find_max_claim(setup, step_limit, max_claim, guess):
+    """
+    Largest amount withdrawn within `step_limit` steps, galloping from
+    `guess` then bisecting. Each probe runs the claim.
+    """
+    async def fits(amount):
+        if amount > max_claim:
+            return False
+        try:
+            await claim(setup, amount, step_limit)
+        except StarkException as e:
+            if e.code != StarknetErrorCode.OUT_OF_RESOURCES:
+                raise
+            print(f"  {amount:>6} tokens: out of resources")
+            return False
+        print(f"  {amount:>6} tokens: fits")
+        return True
+
+    guess = min(max(guess, 1), max_claim)
+    if await fits(guess):
+        low, step = guess, 1
+        while await fits(low + step):
+            low, step = low + step, step * 2
+        high = low + step
+    else:
+        high, step = guess, 1
+        while True:
+            low = max(high - step, 0)
+            if low == 0 or await fits(low):
+                break
+            high, step = low, step * 2
+    # fits(low) or low == 0, not fits(high)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if await fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+async def run(amounts, max_claim, step_limit):
+    setup = await setup_ino(max_claim)
+    state = setup[0]
+    step_limit = step_limit or state.general_config.invoke_tx_max_n_steps
+    rows = []
+    for amount in amounts:
+        rows.append(await claim(setup, amount))
+        print(f"{amount} tokens: {rows[-1]['n_steps']} steps")
+
+    base, per_token = fit_line([row["amount"] for row in rows], [row["execute_n_steps"] for row in rows])
+    guess = int((step_limit - base) // per_token) if per_token > 0 else max_claim
+    print(f"\nlooking for the largest claim within {step_limit} steps, "
+          f"{guess} tokens expected from the sweep")
+    largest = await find_max_claim(setup, step_limit, max_claim, guess)
+    return {
+        "step_limit": step_limit,
+        "max_claim": max_claim,
+        "execute_n_steps_fit": {"base": base, "per_token": per_token},
+        "largest_claim": largest,
+        "rows": rows,
+    }
+
+
+def print_report(report):
+    print(f"\n{'tokens':>8} {'steps':>10} {'VM steps':>10} {'writes':>8} {'events':>8} {'L1 gas':>10} {'time':>10}")
+    for row in report["rows"]:
+        print(f"{row['amount']:>8} {row['n_steps']:>10} {row['execute_n_steps']:>10} {row['storage_writes']:>8} "
+              f"{row['events']:>8} {row['l1_gas_usage']:>10} {row['wall_time']:>9.2f}s")
+    fit = report["execute_n_steps_fit"]
+    print(f"\n__execute__ steps: {fit['base']:.0f} + {fit['per_token']:.1f}/token")
+    if report["largest_claim"] == report["max_claim"]:
+        print(f"a claim of --max-claim ({report['max_claim']}) tokens still fits in {report['step_limit']} steps")
+    else:
+        print(f"largest claim within {report['step_limit']} steps: {report['largest_claim']} tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cost of the INO withdraw_tokens, which mints every token bought in one batch_mint, "
+        "as the amount bought grows, and the largest claim fitting in the step limit")
+    parser.add_argument("--amounts", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50, 100])
+    parser.add_argument("--max-claim", type=int, default=5000,
+                        help="tokens on sale and max participation, the upper bound of the search")
+    parser.add_argument("--step-limit", type=int,
+                        help="steps a transaction may run, invoke_tx_max_n_steps of the general config by default")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(sorted(set(args.amounts)), args.max_claim, args.step_limit))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from signers import SigningPool, sign_hashes  # noqa: E402
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash  # noqa: E402
+
+ADMIN_PRIVATE_KEY = 2345432
+SIGNATURE_EXPIRATION = 3000000000
+IDO_ADDRESS = 0x1234
+
+
+def registration_digests(nb_registrants):
+    """Digests signed by the admin for `nb_registrants` registrations, as sign_registration does"""
+    return [
+        pedersen_hash(pedersen_hash(SIGNATURE_EXPIRATION,
+                      0x10000 + i), IDO_ADDRESS)
+        for i in range(nb_registrants)
+    ]
+
+
+def benchmark(nb_signatures, processes_counts, chunk_size):
+    digests = registration_digests(nb_signatures)
+    print(f"{nb_signatures} signatures")
+
+    start = time.perf_counter()
+    expected = sign_hashes(
+        [(digest, ADMIN_PRIVATE_KEY) for digest in digests])
+    serial = time.perf_counter() - start
+    print(f"serial        {serial:8.2f}s")
+
+    for processes in processes_counts:
+        with SigningPool(processes, chunk_size=chunk_size, min_parallel=0) as pool:
+            # workers are started outside of the timing
+            pool.sign(digests[:processes], ADMIN_PRIVATE_KEY)
+            start = time.perf_counter()
+            signatures = pool.sign(digests, ADMIN_PRIVATE_KEY)
+            elapsed = time.perf_counter() - start
+        assert signatures == expected, "signatures differ from the serial ones"
+        print(
+            f"{processes:3} processes {elapsed:8.2f}s  x{serial / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time SigningPool against serial signing of registration digests")
+    parser.add_argument("--signatures", type=int, default=1000)
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+    benchmark(args.signatures, sorted(set(args.processes)), args.chunk_size)
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from ido_deployment import PARTICIPATION_VALUE, sale_participant  # noqa: E402
+from ido_sale import participate, register, setup_sale, unlock_portions  # noqa: E402
+from measure import fit_line, send_measured  # noqa: E402
+
+METRICS = ("n_steps", "storage_writes", "l1_gas_usage", "wall_time")
+
+
+async def benchmark_portions(nb_portions):
+    """
+    Withdraws the `nb_portions` portions of a participation, with one
+    withdraw_tokens per portion then, from the same state, with a single
+    withdraw_multiple_portions.
+    """
+    sale = await setup_sale(nb_portions=nb_portions)
+    await register(sale)
+    await participate(sale, PARTICIPATION_VALUE)
+    unlock_portions(sale, nb_portions)
+    state = sale.starknet.state
+
+    def withdraw(state, selector_name, calldata):
+        return send_measured(state, sale_participant, sale.account_def, sale.participant,
+                             sale.ido.contract_address, selector_name, calldata)
+
+    withdraw_tokens = []
+    fork = state
+    for portion_id in range(1, nb_portions + 1):
+        fork, _, measures = await withdraw(fork, "withdraw_tokens", [portion_id])
+        withdraw_tokens.append(measures)
+
+    _, _, withdraw_multiple_portions = await withdraw(
+        state, "withdraw_multiple_portions", [nb_portions, *range(1, nb_portions + 1)])
+
+    return {
+        "portions": nb_portions,
+        "withdraw_tokens": {metric: sum(measures[metric] for measures in withdraw_tokens) for metric in METRICS},
+        "withdraw_tokens_calls": withdraw_tokens,
+        "withdraw_multiple_portions": withdraw_multiple_portions,
+    }
+
+
+async def run(portions_counts):
+    rows = []
+    for nb_portions in portions_counts:
+        print(f"{nb_portions} portions ...")
+        rows.append(await benchmark_portions(nb_portions))
+
+    fits = {}
+    for entry_point in ("withdraw_tokens", "withdraw_multiple_portions"):
+        fits[entry_point] = {
+            metric: dict(zip(("base", "per_portion"), fit_line(
+                [row["portions"] for row in rows], [row[entry_point][metric] for row in rows])))
+            for metric in METRICS
+        }
+    return {"rows": rows, "fits": fits}
+
+
+def print_report(report):
+    print(f"\n{'':>8} {'withdraw_tokens x portions':>43}   {'withdraw_multiple_portions':>43}")
+    print(f"{'portions':>8} {'steps':>10} {'writes':>8} {'L1 gas':>10} {'time':>10}   "
+          f"{'steps':>10} {'writes':>8} {'L1 gas':>10} {'time':>10}")
+    for row in report["rows"]:
+        single, multiple = row["withdraw_tokens"], row["withdraw_multiple_portions"]
+        print(f"{row['portions']:>8} {single['n_steps']:>10} {single['storage_writes']:>8} "
+              f"{single['l1_gas_usage']:>10} {single['wall_time']:>9.2f}s   {multiple['n_steps']:>10} "
+              f"{multiple['storage_writes']:>8} {multiple['l1_gas_usage']:>10} {multiple['wall_time']:>9.2f}s")
+
+    print()
+    for entry_point, fits in report["fits"].items():
+        print(f"{entry_point}: " + ", ".join(
+            f"{metric} {fit['base']:.0f} + {fit['per_portion']:.1f}/portion"
+            for metric, fit in fits.items() if metric != "wall_time"))
+
+
+def write_csv(report, path):
+    """One line per number of portions, the curves to plot"""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["portions", *(f"{entry_point}_{metric}" for entry_point in (
+            "withdraw_tokens", "withdraw_multiple_portions") for metric in METRICS)])
+        for row in report["rows"]:
+            writer.writerow([row["portions"], *(row[entry_point][metric] for entry_point in (
+                "withdraw_tokens", "withdraw_multiple_portions") for metric in METRICS)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cost of withdrawing every vesting portion of a participation, portion by portion "
+        "with withdraw_tokens or at once with withdraw_multiple_portions, as the number of portions grows")
+    parser.add_argument("--max-portions", type=int, default=10)
+    parser.add_argument("--step", type=int, default=1,
+                        help="benchmark schedules of 1, 1 + step, ... portions")
+    parser.add_argument("--output", help="write the report, with every withdraw_tokens call, to this JSON file")
+    parser.add_argument("--csv", help="write the curves to this CSV file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(range(1, args.max_portions + 1, args.step)))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.csv:
+        write_csv(report, args.csv)
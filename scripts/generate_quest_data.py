@@ -1,49 +1,285 @@
-from utils import generate_merkle_proof, generate_merkle_root, get_leaves
-from pymongo import MongoClient
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
 import os
-from pprint import pprint as pp
+import re
 import sys
 import json
+import time
 
-sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from hashing import PedersenCache, PedersenPool  # noqa: E402
+from proof_store import write_proof_store  # noqa: E402
+from utils import IncrementalMerkleTree, MerkleTree, get_leaf_columns, verify_all  # noqa: E402
 
 # Get environment variables
 HOST = os.getenv("DB_HOST")
 NAME = os.getenv("DB_NAME")
 
 IDO_ID = 3
+ROOTS_FILE = os.path.join(os.path.dirname(
+    __file__), "configuration", "merkle_roots.txt")
+ROOT_LINE = re.compile(r"^IDO_(\d+)_MERKLE_ROOT=(\S+)$")
+
+
+def quest_counts_pipeline(ido_ids):
+    """Counts the quests of every registered account per IDO in one aggregation"""
+    return [
+        {"$match": {"idoId": {"$in": list(ido_ids)}}},
+        {"$group": {
+            "_id": {"idoId": "$idoId", "address": "$address"},
+            "nb_quest": {"$sum": 1},
+        }},
+        {"$lookup": {
+            "from": "accounts",
+            "localField": "_id.address",
+            "foreignField": "address",
+            "as": "account",
+        }},
+        {"$match": {"account": {"$ne": []}}},
+        {"$project": {"_id": 1, "nb_quest": 1}},
+        {"$sort": {"_id.idoId": 1, "_id.address": 1}},
+    ]
+
+
+def stream_quest_counts(db, ido_ids):
+    """Yields (ido_id, address, nb_quest) for every account with at least one quest done"""
+    cursor = db.questsHistory.aggregate(
+        quest_counts_pipeline(ido_ids), allowDiskUse=True)
+    for doc in cursor:
+        yield doc["_id"]["idoId"], int(doc["_id"]["address"], 16), doc["nb_quest"]
 
 
-def generateQuestData():
-    client = MongoClient(HOST)
-    db = client['zkpad-dev']
-    accounts = db.accounts
-    history = db.questsHistory
+def group_by_ido(quest_counts):
+    """Splits the sorted aggregation stream into one (address, nb_quest) list per IDO"""
+    return {
+        ido_id: [(address, nb_quest) for _, address, nb_quest in rows]
+        for ido_id, rows in groupby(quest_counts, key=lambda row: row[0])
+    }
+
+
+def build_quest_tree(quest_counts, pool=None):
+    """Builds the merkle tree of a (address, nb_quest) stream in a single pass"""
     recipients = []
     amounts = []
-    print('Generating ...')
-    for account in accounts.find():
-        # pp(account)
-        address = account['address']
-        nb_Quest = history.count_documents(
-            {"address": address, "idoId": IDO_ID})
-        if nb_Quest > 0:
-            recipients.append(int(address, 16))
-            amounts.append(nb_Quest)
-    MERKLE_INFO = get_leaves(recipients, amounts)
-    leaves = list(map(lambda x: x[0], MERKLE_INFO))
-    root = generate_merkle_root(leaves)
-    print(root)
-    cached_level = {}
-    cached_level["1"] = []
-    cached_level["2"] = []
-    addressProofMap = dict(map(lambda x, i: [hex(x), generate_merkle_proof(
-        leaves, i, cached_level)], recipients, [k for k in range(len(recipients))]))
+    for address, nb_quest in quest_counts:
+        recipients.append(address)
+        amounts.append(nb_quest)
+
+    leaves = get_leaf_columns(recipients, amounts, pool).leaves
+    return recipients, amounts, MerkleTree(leaves, pool)
+
+
+def build_ido_tree(item):
+    ido_id, quest_counts = item
+    return (ido_id, *build_quest_tree(quest_counts))
+
+
+def build_ido_trees(counts_per_ido, processes=1, hash_cache=None):
+    """
+    Builds every IDO tree, one IDO per process. With a single IDO or a shared
+    `PedersenCache`, the trees are built one after the other instead and the
+    pairs of each tree are hashed on a PedersenPool.
+    """
+    if len(counts_per_ido) > 1 and hash_cache is None:
+        if processes <= 1:
+            return list(map(build_ido_tree, counts_per_ido.items()))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(build_ido_tree, counts_per_ido.items()))
+
+    with PedersenPool(processes) as pool:
+        backend = pool
+        if hash_cache is not None:
+            previous_backend, hash_cache.backend = hash_cache.backend, pool
+            backend = hash_cache
+        try:
+            return [
+                (ido_id, *build_quest_tree(quest_counts, backend))
+                for ido_id, quest_counts in counts_per_ido.items()
+            ]
+        finally:
+            # the pool is closed with the block, the cache must not restart it
+            if hash_cache is not None:
+                hash_cache.backend = previous_backend
+
+
+def get_db(fixture=None):
+    """Returns the quests database, or an in-memory copy of `fixture` for offline runs"""
+    if fixture is None:
+        from pymongo import MongoClient
+        return MongoClient(HOST)['zkpad-dev']
+
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("Offline mode requires mongomock: pip install mongomock")
+
+    with open(fixture) as f:
+        data = json.load(f)
+    db = mongomock.MongoClient()['zkpad-dev']
+    for collection in ("accounts", "questsHistory"):
+        if data.get(collection):
+            db[collection].insert_many(data[collection])
+    return db
+
+
+def audit_trees(trees):
+    """Checks every proof of every tree against its root before it gets published"""
+    for ido_id, recipients, _, tree in trees:
+        leaves = tree.levels[0][: len(recipients)]
+        failing = verify_all(leaves, [tree.proof(i) for i in range(len(recipients))], tree.root)
+        if failing:
+            sys.exit(
+                f"IDO {ido_id}: invalid proofs for {', '.join(hex(recipients[i]) for i in failing)}")
+
+
+def read_roots(roots_file=ROOTS_FILE):
+    """Returns the {ido_id: root} of a roots file, empty when it doesn't exist"""
+    roots = {}
+    if os.path.exists(roots_file):
+        with open(roots_file) as f:
+            for line in f:
+                match = ROOT_LINE.match(line.strip())
+                if match:
+                    roots[int(match[1])] = int(match[2], 16)
+    return roots
+
+
+def write_roots(trees, roots_file=ROOTS_FILE):
+    """
+    Writes the roots as IDO_<id>_MERKLE_ROOT=<root>, the inputs of AstralyIDOFactory.set_merkle_root.
+    The file is merged by IDO id, the roots of the IDOs not in `trees` are kept.
+    """
+    roots = read_roots(roots_file)
+    for ido_id, _, _, tree in trees:
+        roots[ido_id] = tree.root
+    with open(roots_file, "w") as f:
+        for ido_id, root in sorted(roots.items()):
+            f.write(f"IDO_{ido_id}_MERKLE_ROOT={hex(root)}\n")
+
+
+def write_proof_stores(trees, store_dir):
+    """Writes one `ProofStore` file per IDO, named ido_<id>.bin"""
+    os.makedirs(store_dir, exist_ok=True)
+    for ido_id, recipients, amounts, tree in trees:
+        write_proof_store(os.path.join(
+            store_dir, f"ido_{ido_id}.bin"), tree, recipients, amounts)
+
+
+def update_ido_trees(counts_per_ido, store_dir, hash_cache=None):
+    """
+    Applies the quest counts to the IDO trees saved in `store_dir` instead of
+    rebuilding them. Only new accounts and changed counts are rehashed, the
+    root and every proof that changed are written to ido_<id>.diff.json.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    trees = []
+    for ido_id, quest_counts in counts_per_ido.items():
+        path = os.path.join(store_dir, f"ido_{ido_id}.bin")
+        if os.path.exists(path):
+            tree = IncrementalMerkleTree.load(path, hash_cache)
+        else:
+            tree = IncrementalMerkleTree(pool=hash_cache)
+        diff = tree.upsert(*zip(*quest_counts))
+        tree.save(path)
+
+        with open(os.path.join(store_dir, f"ido_{ido_id}.diff.json"), "w") as f:
+            json.dump({
+                "root": hex(diff.root),
+                "nodes": [[level, index, hex(node)] for (level, index), node in sorted(diff.nodes.items())],
+                "proofs": {hex(address): list(map(hex, proof)) for address, proof in tree.diff_proofs(diff).items()},
+            }, f)
+        print(f"IDO {ido_id}: {len(diff.leaves)} leaves updated")
+        trees.append((ido_id, tree.recipients, tree.amounts, tree))
+    return trees
+
+
+def insert_proof_documents(db, trees):
+    """Inserts one {"idoId", "data": {address: proof}} merkleProofs document per IDO"""
+    documents = []
+    for ido_id, recipients, _, tree in trees:
+        # felts don't fit in BSON ints, proofs are stored as hex strings
+        addressProofMap = dict(map(lambda x, i: [hex(x), list(map(hex, tree.proof(i)))],
+                                   recipients, [k for k in range(len(recipients))]))
+        documents.append({"idoId": ido_id, "data": addressProofMap})
     # merkle_proof = db.merkleProofs.find_one({"idoId":IDO_ID})
     # if merkle_proof :
     #     db.merkleProofs.find_one_and_update({})
-    db.merkleProofs.insert_one({"idoId": IDO_ID, "data": addressProofMap})
-    print("done")
+    if documents:
+        db.merkleProofs.insert_many(documents)
+
+
+def generateQuestData(ido_ids=(IDO_ID,), fixture=None, processes=1, roots_file=ROOTS_FILE, store_dir=None,
+                      incremental=False, audit=False, hash_cache_file=None):
+    db = get_db(fixture)
+    print('Generating ...')
+    start = time.perf_counter()
+    hash_cache = None
+    if hash_cache_file is not None:
+        hash_cache = PedersenCache(path=hash_cache_file)
+
+    counts_per_ido = group_by_ido(stream_quest_counts(db, ido_ids))
+    missing = [ido_id for ido_id in ido_ids if ido_id not in counts_per_ido]
+    if missing:
+        print(f"warning: no quest history for IDO {', '.join(map(str, missing))}, "
+              "their roots and proofs are left as they are", file=sys.stderr)
+    if incremental:
+        trees = update_ido_trees(counts_per_ido, store_dir, hash_cache)
+    else:
+        trees = build_ido_trees(counts_per_ido, processes, hash_cache)
+
+    if hash_cache is not None:
+        hash_cache.save()
+        print(
+            f"hash cache: {hash_cache.hits} hits, {hash_cache.misses} misses")
+
+    for ido_id, recipients, _, tree in trees:
+        print(f"IDO {ido_id}: {len(recipients)} accounts, root {tree.root}")
+    if audit:
+        audit_trees(trees)
+    write_roots(trees, roots_file)
+
+    if store_dir is None:
+        insert_proof_documents(db, trees)
+    elif not incremental:
+        # incremental runs already saved their stores
+        write_proof_stores(trees, store_dir)
+    print(f"done: {len(trees)} IDOs in {time.perf_counter() - start:.2f}s")
+
+
+def parse_ido_ids(values):
+    """Parses IDO ids given as single ids or inclusive ranges, e.g. `3 5-8`"""
+    ido_ids = []
+    for value in values:
+        first, _, last = value.partition("-")
+        ido_ids.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(ido_ids))
 
 
-generateQuestData()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate the quests merkle roots and proofs of one or more IDOs")
+    parser.add_argument("--ido-ids", nargs="+", default=[str(IDO_ID)],
+                        help="IDO ids or inclusive ranges, e.g. `3 5-8`")
+    parser.add_argument(
+        "--fixture", help="JSON file with `accounts` and `questsHistory` documents, "
+        "loaded in mongomock instead of connecting to DB_HOST, e.g. tests/fixtures/quests.json")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="number of processes hashing the trees")
+    parser.add_argument("--roots-file", default=ROOTS_FILE,
+                        help="where to write the roots for set_merkle_root")
+    parser.add_argument("--store-dir",
+                        help="write the proofs as ido_<id>.bin proof stores in this directory "
+                        "instead of merkleProofs documents")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the proof stores of --store-dir in place and write the diffs")
+    parser.add_argument("--audit", action="store_true",
+                        help="verify every proof against its root before writing anything")
+    parser.add_argument("--hash-cache",
+                        help="pedersen hash cache file, loaded before and saved after the run")
+    args = parser.parse_args()
+    if args.incremental and args.store_dir is None:
+        parser.error("--incremental requires --store-dir")
+    generateQuestData(parse_ido_ids(args.ido_ids), args.fixture,
+                      args.processes, args.roots_file, args.store_dir, args.incremental, args.audit, args.hash_cache)
@@ -0,0 +1,117 @@
+"""The IDO of the tests on an in-memory Starknet, set up like the setup_sale fixture, for the scripts"""
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from starkware.starknet.testing.starknet import Starknet  # noqa: E402
+
+from ido_deployment import (  # noqa: E402
+    BASE_ALLOCATION, MAX_PARTICIPATION, TOKEN_PRICE, TOKENS_TO_SELL, VESTING_PRECISION, admin1, deploy_contracts,
+    get_contract_defs, sale_owner, sale_participant, sig_exp, sign_registration,
+)
+from utils import (  # noqa: E402
+    from_uint, get_state_snapshots, set_block_timestamp, to_uint, uarr2cd, uint_array,
+)
+
+Sale = namedtuple("Sale", [
+    "starknet", "account_def", "admin", "owner", "participant", "ido", "erc20_eth_token",
+    "registration_start", "purchase_round_start", "vesting_times",
+])
+
+
+def get_vesting_percentages(nb_portions):
+    """Splits VESTING_PRECISION over `nb_portions` portions, the last one takes the remainder"""
+    precision = from_uint(VESTING_PRECISION)
+    percentages = [precision // nb_portions] * nb_portions
+    percentages[-1] += precision - sum(percentages)
+    return percentages
+
+
+async def setup_sale(max_winners_len=None, nb_portions=4):
+    """
+    Deploys the contracts of the IDO tests (restoring its state snapshot)
+    and sets the sale, vesting, registration and purchase round params of
+    the IDO before depositing the tokens to sell.
+
+    Parameters
+    ----------
+
+    max_winners_len : int, optional
+        Sets the base allocation to TOKENS_TO_SELL / max_winners_len, BASE_ALLOCATION
+        otherwise.
+
+    nb_portions : int
+        Vesting portions, unlocked a day apart from a day after the token unlock.
+
+    """
+    contract_defs = get_contract_defs()
+    starknet = await Starknet.empty()
+    day = datetime.today()
+    set_block_timestamp(starknet.state, int(day.timestamp()))
+    contracts = await get_state_snapshots().restore_or_deploy(starknet, contract_defs, deploy_contracts)
+    admin, owner, participant, ido, erc20_eth_token = (
+        contracts[1], contracts[3], contracts[4], contracts[8], contracts[9])
+
+    sale_end = day + timedelta(days=90)
+    token_unlock = sale_end + timedelta(weeks=1)
+    base_allocation = BASE_ALLOCATION if max_winners_len is None else to_uint(
+        from_uint(TOKENS_TO_SELL) // max_winners_len)
+    await admin1.send_transaction(admin, ido.contract_address, "set_sale_params", [
+        erc20_eth_token.contract_address,
+        owner.contract_address,
+        *TOKEN_PRICE,
+        *TOKENS_TO_SELL,
+        int(sale_end.timestamp()),
+        int(token_unlock.timestamp()),
+        *VESTING_PRECISION,
+        *base_allocation,
+    ])
+
+    vesting_times = [int(token_unlock.timestamp()) + (1 + i) * 24 * 60 * 60 for i in range(nb_portions)]
+    await admin1.send_transaction(admin, ido.contract_address, "set_vesting_params", [
+        nb_portions, *vesting_times, *uarr2cd(uint_array(get_vesting_percentages(nb_portions)))])
+
+    registration_start = day + timedelta(days=1)
+    registration_end = registration_start + timedelta(weeks=1)
+    await admin1.send_transaction(admin, ido.contract_address, "set_registration_time", [
+        int(registration_start.timestamp()), int(registration_end.timestamp())])
+
+    purchase_round_start = registration_end + timedelta(days=1)
+    await admin1.send_transaction(admin, ido.contract_address, "set_purchase_round_params", [
+        int(purchase_round_start.timestamp()),
+        int((purchase_round_start + timedelta(weeks=1)).timestamp()),
+        *MAX_PARTICIPATION,
+    ])
+
+    await sale_owner.send_transaction(
+        owner, erc20_eth_token.contract_address, "approve", [ido.contract_address, *TOKENS_TO_SELL])
+    await sale_owner.send_transaction(owner, ido.contract_address, "deposit_tokens", [])
+
+    return Sale(starknet, contract_defs[0], admin, owner, participant, ido, erc20_eth_token,
+                int(registration_start.timestamp()), int(purchase_round_start.timestamp()), vesting_times)
+
+
+async def register(sale, signer=sale_participant, account=None):
+    """Registers `account`, the participant of the tests by default, at the start of the registration"""
+    account = account or sale.participant
+    set_block_timestamp(sale.starknet.state, sale.registration_start + 1)
+    signature = sign_registration(sig_exp, account.contract_address, sale.ido.contract_address, admin1.signer)
+    return await signer.send_transaction(
+        account, sale.ido.contract_address, "register_user", [len(signature), *signature, sig_exp])
+
+
+async def participate(sale, value, signer=sale_participant, account=None):
+    """Pays `value` (Uint256) for tokens of the sale at the start of the purchase round"""
+    account = account or sale.participant
+    set_block_timestamp(sale.starknet.state, sale.purchase_round_start + 1)
+    await signer.send_transaction(
+        account, sale.erc20_eth_token.contract_address, "approve", [sale.ido.contract_address, *value])
+    return await signer.send_transaction(account, sale.ido.contract_address, "participate", [*value])
+
+
+def unlock_portions(sale, nb_portions):
+    """Moves to the unlock time of the first `nb_portions` vesting portions"""
+    set_block_timestamp(sale.starknet.state, sale.vesting_times[nb_portions - 1] + 1)
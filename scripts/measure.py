@@ -0,0 +1,42 @@
+"""Cost of single transactions on the in-memory Starknet, for the benchmark scripts"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from utils import cached_contract, fork_state, get_event_index  # noqa: E402
+
+
+async def send_measured(state, signer, account_def, account, to, selector_name, calldata):
+    """
+    Sends a transaction on a fork of `state` and measures it.
+
+    The fork holds the writes of the transaction only, chain calls by
+    passing the returned fork as the `state` of the next one.
+
+    Returns (fork, tx, measures)
+    """
+    fork = fork_state(state)
+    account = cached_contract(fork, account_def, account)
+    start = time.perf_counter()
+    tx = await signer.send_transaction(account, to, selector_name, calldata)
+    wall_time = time.perf_counter() - start
+
+    return fork, tx, {
+        "n_steps": tx.actual_resources["n_steps"],
+        "storage_writes": len(fork.state.cache._storage_writes),
+        "events": len(get_event_index(tx)),
+        "l1_gas_usage": tx.actual_resources.get("l1_gas_usage", 0),
+        "wall_time": wall_time,
+    }
+
+
+def fit_line(xs, ys):
+    """Least squares (intercept, slope) of ys over xs"""
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return mean_y, 0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+    return mean_y - slope * mean_x, slope
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from ido_deployment import PARTICIPATION_VALUE, sale_participant  # noqa: E402
+from ido_sale import participate, register, setup_sale, unlock_portions  # noqa: E402
+from step_profiler import StepProfiler  # noqa: E402
+from utils import set_block_timestamp  # noqa: E402
+
+
+async def approved(sale):
+    await register(sale)
+    set_block_timestamp(sale.starknet.state, sale.purchase_round_start + 1)
+    await sale_participant.send_transaction(
+        sale.participant, sale.erc20_eth_token.contract_address, "approve",
+        [sale.ido.contract_address, *PARTICIPATION_VALUE])
+
+
+async def participated(sale):
+    await register(sale)
+    await participate(sale, PARTICIPATION_VALUE)
+    unlock_portions(sale, len(sale.vesting_times))
+
+
+async def send_register_user(sale):
+    return await register(sale)
+
+
+async def send_participate(sale):
+    return await sale_participant.send_transaction(
+        sale.participant, sale.ido.contract_address, "participate", [*PARTICIPATION_VALUE])
+
+
+async def send_withdraw_tokens(sale):
+    return await sale_participant.send_transaction(sale.participant, sale.ido.contract_address, "withdraw_tokens", [1])
+
+
+async def send_withdraw_multiple_portions(sale):
+    nb_portions = len(sale.vesting_times)
+    return await sale_participant.send_transaction(
+        sale.participant, sale.ido.contract_address, "withdraw_multiple_portions",
+        [nb_portions, *range(1, nb_portions + 1)])
+
+
+async def no_setup(sale):
+    pass
+
+
+# entry point -> (transactions before it, transaction profiled)
+SCENARIOS = {
+    "register_user": (no_setup, send_register_user),
+    "participate": (approved, send_participate),
+    "withdraw_tokens": (participated, send_withdraw_tokens),
+    "withdraw_multiple_portions": (participated, send_withdraw_multiple_portions),
+}
+
+
+async def run(entry_point, nb_portions):
+    setup, send = SCENARIOS[entry_point]
+    sale = await setup_sale(nb_portions=nb_portions)
+    await setup(sale)
+    with StepProfiler() as profiler:
+        tx = await send(sale)
+    return profiler, tx
+
+
+def print_functions(profiler, tx, top):
+    calls = [info for info in (tx.validate_info, tx.call_info) if info is not None]
+    n_steps = sum(info.execution_resources.n_steps for info in calls)
+    print(f"{sum(profiler.stacks.values())} steps profiled, {n_steps} run by __validate__ and __execute__, "
+          f"{tx.actual_resources['n_steps']} for the transaction with the OS steps of its syscalls\n")
+    print(f"{'total':>8} {'self':>8}  function")
+    for function, (self_steps, total_steps) in list(profiler.functions().items())[:top]:
+        print(f"{total_steps:>8} {self_steps:>8}  {function}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Profile the steps of an entry point of the IDO per Cairo function")
+    parser.add_argument("entry_point", choices=SCENARIOS)
+    parser.add_argument("--portions", type=int, default=4,
+                        help="vesting portions of the sale, all withdrawn by withdraw_multiple_portions")
+    parser.add_argument("--folded", help="write the stacks to this file, for flamegraph.pl or speedscope")
+    parser.add_argument("--pprof", help="write a gzipped pprof profile to this file")
+    parser.add_argument("--top", type=int, default=30, help="functions listed, by total steps")
+    args = parser.parse_args()
+
+    profiler, tx = asyncio.run(run(args.entry_point, args.portions))
+    print_functions(profiler, tx, args.top)
+    if args.folded:
+        profiler.write_folded(args.folded)
+    if args.pprof:
+        profiler.write_pprof(args.pprof)
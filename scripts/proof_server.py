@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from urllib.parse import unquote
+
+from proof_store import ProofStore
+
+STORE_NAME = re.compile(r"^ido_(\d+)\.bin$")
+PROOF_ROUTE = re.compile(r"^/ido/(\d+)/proof/(0x[0-9a-fA-F]+)$")
+PROOFS_ROUTE = re.compile(r"^/ido/(\d+)/proofs$")
+CONTENT_LENGTH = re.compile(r"^[0-9]+$")
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ProofServer:
+    """
+    Serves the quest proofs of the ido_<id>.bin proof stores in `store_dir`.
+
+    GET  /ido/{id}/proof/{address}  proof of one address
+    POST /ido/{id}/proofs           proofs of {"addresses": [...]} in one request
+
+    Stores are memory-mapped and looked up in place. `store_dir` is polled
+    every `reload_interval` seconds: new or replaced stores, i.e. a new
+    published root, are swapped in without restarting.
+
+    Examples
+    ---------
+    >>> server = ProofServer("proofs/")
+    >>> await server.start("127.0.0.1", 8080)
+    >>> await server.serve_forever()
+
+    """
+
+    def __init__(self, store_dir, reload_interval=5):
+        self.store_dir = store_dir
+        self.reload_interval = reload_interval
+        self.stores = {}
+        self._versions = {}
+        self._server = None
+        self._reloader = None
+
+    def reload(self):
+        """
+        (Re)opens every store of `store_dir` which is new or changed since the
+        last call. A store which can't be opened is logged and its previous
+        version, if any, is kept until the file changes again.
+        """
+        seen = set()
+        for name in os.listdir(self.store_dir):
+            match = STORE_NAME.match(name)
+            if match is None:
+                continue
+            ido_id = int(match.group(1))
+            seen.add(ido_id)
+            path = os.path.join(self.store_dir, name)
+            try:
+                # stores are replaced by a rename, a new inode means a new root
+                stat = os.stat(path)
+                version = (stat.st_ino, stat.st_mtime_ns)
+                if self._versions.get(ido_id) == version:
+                    continue
+                self._versions[ido_id] = version
+                store = ProofStore(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Can't open the proof store of IDO {ido_id}, keeping the previous one: {e}")
+                continue
+
+            previous = self.stores.get(ido_id)
+            self.stores[ido_id] = store
+            if previous is not None:
+                previous.close()
+
+        for ido_id in set(self._versions) - seen:
+            store = self.stores.pop(ido_id, None)
+            if store is not None:
+                store.close()
+            del self._versions[ido_id]
+
+    async def _reload_forever(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                self.reload()
+            except OSError as e:
+                logger.error(f"Can't list {self.store_dir}: {e}")
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.reload()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._reloader = asyncio.ensure_future(self._reload_forever())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._reloader.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+        for store in self.stores.values():
+            store.close()
+        self.stores = {}
+        self._versions = {}
+
+    def get_store(self, ido_id):
+        store = self.stores.get(ido_id)
+        if store is None:
+            raise HTTPError(404, f"Unknown IDO {ido_id}")
+        return store
+
+    @staticmethod
+    def get_proof(store, address):
+        amount = store.get_amount(address)
+        if amount is None:
+            return None
+        return {
+            "address": hex(address),
+            "amount": amount,
+            "proof": list(map(hex, store.get_proof(address))),
+        }
+
+    def route(self, method, path, body):
+        match = PROOF_ROUTE.match(path)
+        if match is not None:
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            ido_id = int(match.group(1))
+            store = self.get_store(ido_id)
+            proof = self.get_proof(store, int(match.group(2), 16))
+            if proof is None:
+                raise HTTPError(404, f"No proof for {match.group(2)}")
+            return {"idoId": ido_id, "root": hex(store.root), **proof}
+
+        match = PROOFS_ROUTE.match(path)
+        if match is not None:
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            ido_id = int(match.group(1))
+            store = self.get_store(ido_id)
+            try:
+                addresses = [int(address, 16)
+                             for address in json.loads(body)["addresses"]]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(
+                    400, 'Expected {"addresses": ["0x..", ...]}')
+            proofs = {hex(address): self.get_proof(store, address)
+                      for address in addresses}
+            return {"idoId": ido_id, "root": hex(store.root), "proofs": proofs}
+
+        raise HTTPError(404, f"Unknown route {path}")
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            content_length = headers.get("content-length", "0")
+            valid_length = CONTENT_LENGTH.match(content_length) is not None
+            body = await reader.readexactly(int(content_length)) if valid_length else b""
+
+            try:
+                if not valid_length:
+                    raise HTTPError(400, "Invalid Content-Length")
+                if len(request_line) < 2:
+                    raise HTTPError(400, "Malformed request")
+                method, path = request_line[0], unquote(
+                    request_line[1].split("?")[0])
+                status, payload = 200, self.route(method, path, body)
+            except HTTPError as e:
+                status, payload = e.status, {"error": str(e)}
+
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main(store_dir, host, port, reload_interval):
+    server = ProofServer(store_dir, reload_interval)
+    host, port = await server.start(host, port)
+    print(f"Serving {len(server.stores)} IDOs from {store_dir} on {host}:{port}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve quest merkle proofs from the proof stores written by generate_quest_data --store-dir")
+    parser.add_argument("store_dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--reload-interval", type=float, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.store_dir, args.host,
+                args.port, args.reload_interval))
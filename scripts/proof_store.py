@@ -0,0 +1,188 @@
+"""Compact on-disk store of merkle proofs, memory-mapped for lookups."""
+from bisect import bisect_left
+import mmap
+import os
+import struct
+
+MAGIC = b"ASTRLYMP"
+VERSION = 1
+
+FELT_SIZE = 32
+# magic, version, number of recipients, number of levels
+HEADER = struct.Struct("<8sIII")
+LEVEL_LEN = struct.Struct("<I")
+# address, amount, leaf index
+ENTRY = struct.Struct(f"<{FELT_SIZE}s{FELT_SIZE}sI")
+
+
+def felt_to_bytes(value):
+    return value.to_bytes(FELT_SIZE, "big")
+
+
+def felt_from_bytes(data):
+    return int.from_bytes(data, "big")
+
+
+def write_proof_store(path, tree, recipients, amounts):
+    """
+    Writes `tree` and its recipients to `path`.
+
+    Layout: header, the length of every level, the (address, amount, leaf
+    index) entries sorted by address, then every level of the tree as
+    fixed-width 32-byte felts. Levels are stored once, proofs are read from
+    them on lookup.
+    """
+    entries = sorted(
+        (address, amount, index)
+        for index, (address, amount) in enumerate(zip(recipients, amounts))
+    )
+    # written aside then moved, readers never map a half written store
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), len(tree.levels)))
+        for level in tree.levels:
+            f.write(LEVEL_LEN.pack(len(level)))
+        for address, amount, index in entries:
+            f.write(ENTRY.pack(felt_to_bytes(address),
+                    felt_to_bytes(amount), index))
+        for level in tree.levels:
+            f.write(b"".join(map(felt_to_bytes, level)))
+    os.replace(tmp_path, path)
+
+
+class ProofStore:
+    """
+    Read-only view over a file written by `write_proof_store`.
+
+    The file is memory-mapped: finding a recipient is a binary search over
+    the address index and a proof costs one read per level, nothing else is
+    deserialized.
+
+    Examples
+    ---------
+    >>> with ProofStore("ido_3.bin") as store:
+            amount = store.get_amount(address)
+            proof = store.get_proof(address)
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_layout()
+        except (ValueError, struct.error) as e:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a valid proof store: {e}") from e
+
+    def _read_layout(self):
+        magic, version, self._size, nb_levels = HEADER.unpack_from(
+            self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("bad magic or version")
+
+        offset = HEADER.size
+        level_lens = []
+        for _ in range(nb_levels):
+            level_lens.append(LEVEL_LEN.unpack_from(self._mmap, offset)[0])
+            offset += LEVEL_LEN.size
+
+        self._entries_offset = offset
+        offset += self._size * ENTRY.size
+        self._level_offsets = []
+        for level_len in level_lens:
+            self._level_offsets.append(offset)
+            offset += level_len * FELT_SIZE
+        if offset != len(self._mmap):
+            raise ValueError(f"{len(self._mmap)} bytes, expected {offset}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, address):
+        return self._find(address) is not None
+
+    def close(self):
+        self._mmap.close()
+
+    @property
+    def root(self):
+        return self._node(len(self._level_offsets) - 1, 0)
+
+    def _node(self, level, index):
+        offset = self._level_offsets[level] + index * FELT_SIZE
+        return felt_from_bytes(self._mmap[offset: offset + FELT_SIZE])
+
+    def _entry(self, position):
+        address, amount, index = ENTRY.unpack_from(
+            self._mmap, self._entries_offset + position * ENTRY.size
+        )
+        return felt_from_bytes(address), felt_from_bytes(amount), index
+
+    def _find(self, address):
+        addresses = _AddressColumn(self)
+        position = bisect_left(addresses, address)
+        if position < self._size and addresses[position] == address:
+            return self._entry(position)
+        return None
+
+    def get_amount(self, address):
+        entry = self._find(address)
+        return None if entry is None else entry[1]
+
+    def get_proof(self, address):
+        """Returns the proof of `address`, as `MerkleTree.proof` does, or None when unknown"""
+        entry = self._find(address)
+        if entry is None:
+            return None
+        return self._proof(entry[2])
+
+    def _proof(self, index):
+        proof = []
+        for level in range(len(self._level_offsets) - 1):
+            proof.append(self._node(level, index ^ 1))
+            index //= 2
+        return proof
+
+    def entries(self):
+        """Yields (address, amount, leaf index) for every recipient, by address"""
+        for position in range(self._size):
+            yield self._entry(position)
+
+    def get_levels(self):
+        """Reads every level of the tree, bottom up"""
+        levels = []
+        ends = self._level_offsets[1:] + [len(self._mmap)]
+        for start, end in zip(self._level_offsets, ends):
+            levels.append([
+                felt_from_bytes(self._mmap[offset: offset + FELT_SIZE])
+                for offset in range(start, end, FELT_SIZE)
+            ])
+        return levels
+
+    def items(self):
+        """Yields (address, amount, proof) for every recipient, by address"""
+        for position in range(self._size):
+            address, amount, index = self._entry(position)
+            yield address, amount, self._proof(index)
+
+
+class _AddressColumn:
+    """Sequence of the sorted addresses, read lazily for bisect"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, position):
+        offset = self._store._entries_offset + position * ENTRY.size
+        return felt_from_bytes(self._store._mmap[offset: offset + FELT_SIZE])
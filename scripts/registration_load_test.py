@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from cachetools import LRUCache  # noqa: E402
+from nile.signer import Signer  # noqa: E402
+from starkware.starknet.core.os.class_hash import set_class_hash_cache  # noqa: E402
+from starkware.starknet.public.abi import get_storage_var_address  # noqa: E402
+
+from ido_deployment import admin1, get_registration_digest, sig_exp  # noqa: E402
+from ido_sale import setup_sale  # noqa: E402
+from signers import MockSigner, SigningPool, get_invoke_hash, prepare_call  # noqa: E402
+from utils import set_block_timestamp  # noqa: E402
+
+REGISTRANT_KEY_OFFSET = 10**6
+
+
+async def setup_registration(max_winners_len):
+    """Deploys the IDO of the tests and opens its registration, with room for `max_winners_len` winners"""
+    sale = await setup_sale(max_winners_len)
+    set_block_timestamp(sale.starknet.state, sale.registration_start + 1)
+    return sale.starknet, sale.account_def, sale.ido
+
+
+def sign_registrations(
+    signature_expiration_timestamp, user_addresses, contract_address, signer: Signer, pool: SigningPool
+) -> List[Tuple[int, int]]:
+    """Signs the registration of every user, over the processes of `pool`"""
+    digests = [
+        get_registration_digest(
+            signature_expiration_timestamp, user_address, contract_address)
+        for user_address in user_addresses
+    ]
+    return pool.sign(digests, signer.private_key)
+
+
+async def deploy_registrants(starknet, account_def, nb_registrants):
+    registrants = []
+    for i in range(nb_registrants):
+        signer = MockSigner(REGISTRANT_KEY_OFFSET + i)
+        account = await starknet.deploy(contract_class=account_def, constructor_calldata=[signer.public_key])
+        registrants.append((signer, account))
+    return registrants
+
+
+async def get_storage_var(state, address, name):
+    return await state.state.get_storage_at(address, get_storage_var_address(name))
+
+
+def find_jumps(rows, window, jump_factor):
+    """
+    Registrations whose n_steps exceed `jump_factor` times the median of the
+    `window` previous ones. Of consecutive costlier calls, only the first one
+    is reported.
+    """
+    jumps = []
+    previous_jump = None
+    for i in range(window, len(rows)):
+        baseline = statistics.median(
+            row["n_steps"] for row in rows[i - window: i])
+        if rows[i]["n_steps"] <= jump_factor * baseline:
+            continue
+        if previous_jump != i - 1:
+            jumps.append({"registrant": rows[i]["registrant"], "n_steps": rows[i]["n_steps"],
+                          "previous_median": baseline, "winners_len": rows[i]["winners_len"]})
+        previous_jump = i
+    return jumps
+
+
+def summarize(rows, report_every):
+    checkpoints = []
+    for end in range(report_every, len(rows) + report_every, report_every):
+        window = rows[end - report_every: end]
+        if not window:
+            break
+        builtins = sorted({name for row in window for name in row["builtins"]})
+        checkpoints.append({
+            "registrants": window[-1]["registrant"] + 1,
+            "wall_time": sum(row["wall_time"] for row in window),
+            "throughput": len(window) / sum(row["wall_time"] for row in window),
+            "mean_n_steps": statistics.mean(row["n_steps"] for row in window),
+            "max_n_steps": max(row["n_steps"] for row in window),
+            "mean_builtins": {name: statistics.mean(row["builtins"].get(name, 0) for row in window)
+                              for name in builtins},
+        })
+    return checkpoints
+
+
+async def run(nb_registrants, max_winners_len, processes, report_every, window, jump_factor):
+    print(f"Deploying the IDO and {nb_registrants} registrant accounts ...")
+    # deploying the same account class recomputes its class hash every time otherwise
+    with set_class_hash_cache(LRUCache(maxsize=16)):
+        starknet, account_def, ido = await setup_registration(max_winners_len)
+        registrants = await deploy_registrants(starknet, account_def, nb_registrants)
+
+    start = time.perf_counter()
+    register_user = prepare_call(ido.contract_address, "register_user")
+    with SigningPool(processes) as pool:
+        signatures = sign_registrations(
+            sig_exp, [account.contract_address for _, account in registrants], ido.contract_address,
+            admin1.signer, pool)
+        calls = [register_user(len(signature), *signature, sig_exp)
+                 for signature in signatures]
+        # fresh accounts, every registration is sent with nonce 0
+        tx_signatures = pool.sign_batch(
+            (get_invoke_hash(account.contract_address, [call], 0), signer.signer.private_key)
+            for (signer, account), call in zip(registrants, calls)
+        )
+    signing_time = time.perf_counter() - start
+    print(f"{2 * nb_registrants} signatures in {signing_time:.2f}s")
+
+    rows = []
+    for i, ((signer, account), call, tx_signature) in enumerate(zip(registrants, calls, tx_signatures)):
+        winners_len = await get_storage_var(starknet.state, ido.contract_address, "IDO_winners_arr_len")
+        start = time.perf_counter()
+        tx = await signer.send_prepared_calls(account, [call], nonce=0, signature=tx_signature)
+        wall_time = time.perf_counter() - start
+
+        resources = dict(tx.actual_resources)
+        rows.append({
+            "registrant": i,
+            "winners_len": winners_len,
+            "wall_time": wall_time,
+            "n_steps": resources.pop("n_steps"),
+            "l1_gas_usage": resources.pop("l1_gas_usage", 0),
+            "builtins": {name: count for name, count in resources.items() if count},
+            "n_memory_holes": tx.call_info.execution_resources.n_memory_holes,
+        })
+
+    return {
+        "registrants": nb_registrants,
+        "max_winners_len": max_winners_len,
+        "signing_time": signing_time,
+        "wall_time": sum(row["wall_time"] for row in rows),
+        "winners_full_at": next((row["registrant"] for row in rows if row["winners_len"] == max_winners_len), None),
+        "checkpoints": summarize(rows, report_every),
+        "jumps": find_jumps(rows, window, jump_factor),
+        "calls": rows,
+    }
+
+
+def print_report(report):
+    print(f"\n{'registrants':>12} {'wall time':>10} {'reg/s':>8} {'mean steps':>11} {'max steps':>10}  builtins")
+    for checkpoint in report["checkpoints"]:
+        builtins = ", ".join(f"{name.replace('_builtin', '')} {count:.0f}"
+                             for name, count in checkpoint["mean_builtins"].items())
+        print(f"{checkpoint['registrants']:>12} {checkpoint['wall_time']:>9.2f}s {checkpoint['throughput']:>8.2f} "
+              f"{checkpoint['mean_n_steps']:>11.0f} {checkpoint['max_n_steps']:>10}  {builtins}")
+
+    if report["winners_full_at"] is not None:
+        print(f"\nIDO_winners_arr_len reaches max_winners_len ({report['max_winners_len']}) "
+              f"before registrant {report['winners_full_at']}")
+    for jump in report["jumps"]:
+        print(f"jump at registrant {jump['registrant']}: {jump['n_steps']} steps, "
+              f"median of the previous ones {jump['previous_median']:.0f} (winners_len {jump['winners_len']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Register users with real signatures on an in-memory IDO and report the cost of register_user as registrants grow")
+    parser.add_argument("--registrants", type=int, default=100)
+    parser.add_argument("--max-winners", type=int, default=50,
+                        help="max_winners_len of the sale, registrations past it draw random numbers")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="processes signing the registrations")
+    parser.add_argument("--report-every", type=int, default=10,
+                        help="registrations per line of the report")
+    parser.add_argument("--window", type=int, default=10,
+                        help="registrations a call is compared to when looking for jumps")
+    parser.add_argument("--jump-factor", type=float, default=1.2,
+                        help="flag calls costing this many times the median of the previous ones")
+    parser.add_argument("--output", help="write the full report, with every call, to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.registrants, args.max_winners, args.processes,
+                         args.report_every, args.window, args.jump_factor))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,36 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from compile_cache import write_artifact_meta  # noqa: E402
+
+
+def stamp(artifact_dirs, **flags):
+    """Records the compiler of every contract artifact of `artifact_dirs`"""
+    for artifact_dir in artifact_dirs:
+        for artifact in sorted(Path(artifact_dir).glob("*.json")):
+            if artifact.name.endswith(".meta.json"):
+                continue
+            try:
+                compiled = "program" in json.loads(artifact.read_text())
+            except ValueError:
+                compiled = False
+            if not compiled:
+                continue
+            meta = write_artifact_meta(artifact, **flags)
+            print(f"{artifact}: cairo-lang {meta['cairo_lang']}, {meta['flags']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Record the cairo-lang version and compiler flags of nile/protostar artifacts, "
+        "the tests only load artifacts (USE_ARTIFACTS=1) matching their own")
+    parser.add_argument("artifact_dirs", nargs="*", default=["build", "artifacts"])
+    parser.add_argument("--disable-hint-validation", action="store_true",
+                        help="the artifacts were built with --disable-hint-validation")
+    args = parser.parse_args()
+    stamp(args.artifact_dirs, disable_hint_validation=args.disable_hint_validation)
@@ -0,0 +1,226 @@
+"""Persistent, content-addressed cache of compiled contracts."""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.services.api.contract_class import ContractClass
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IMPORT = re.compile(r"^\s*from\s+([\w.]+)\s+import\b", re.MULTILINE)
+
+
+def import_closure(path, search_paths):
+    """
+    Returns {file: sha256} for `path` and every Cairo module it imports,
+    transitively. The cairo-lang standard library is left out, it is covered
+    by the cairo-lang version in the cache key.
+    """
+    closure = {}
+    pending = [str(Path(path).resolve())]
+    while pending:
+        current = pending.pop()
+        if current in closure:
+            continue
+        source = Path(current).read_bytes()
+        closure[current] = hashlib.sha256(source).hexdigest()
+
+        for module in IMPORT.findall(source.decode()):
+            if module.startswith("starkware."):
+                continue
+            relative = Path(*module.split(".")).with_suffix(".cairo")
+            for search_path in search_paths:
+                candidate = Path(search_path) / relative
+                if candidate.is_file():
+                    pending.append(str(candidate.resolve()))
+                    break
+    return closure
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on `path` across processes, e.g. pytest-xdist workers"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def protostar_contracts(protostar_toml):
+    """Returns {source file: contract name} from the ["protostar.contracts"] table"""
+    contracts = {}
+    root = Path(protostar_toml).parent
+    section = None
+    name = None
+    for line in Path(protostar_toml).read_text().splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            section = line
+            continue
+        if section != '["protostar.contracts"]':
+            continue
+        if "=" in line:
+            name = line.split("=")[0].strip()
+        for source in re.findall(r'"([^"]+\.cairo)"', line):
+            contracts[str((root / source).resolve())] = name
+    return contracts
+
+
+def artifact_meta_path(artifact):
+    return Path(artifact).with_suffix(".meta.json")
+
+
+def write_artifact_meta(artifact, **flags):
+    """
+    Records next to `artifact`, as `<name>.meta.json`, the cairo-lang version
+    which compiled it and its compiler flags. The version and debug_info are
+    read from the compiled program, the other flags are the ones given.
+    """
+    program = json.loads(Path(artifact).read_text())["program"]
+    meta = {
+        "cairo_lang": program.get("compiler_version"),
+        "flags": {**flags, "debug_info": program.get("debug_info") is not None},
+    }
+    artifact_meta_path(artifact).write_text(json.dumps(meta, sort_keys=True))
+    return meta
+
+
+def read_artifact_meta(artifact):
+    """Returns what `write_artifact_meta` recorded for `artifact`, None when nothing was"""
+    meta_path = artifact_meta_path(artifact)
+    if not meta_path.is_file():
+        return None
+    return json.loads(meta_path.read_text())
+
+
+def find_artifact(path, search_paths, artifact_dirs, names=(), **flags):
+    """
+    Returns the compiled artifact of `path` (nile `artifacts/<file name>.json`
+    or protostar `build/<contract name>.json`) when it is newer than every
+    file of its import closure and was built by this cairo-lang version with
+    `flags`, as recorded by `write_artifact_meta`. None otherwise.
+    """
+    candidates = [
+        Path(artifact_dir) / f"{name}.json"
+        for artifact_dir in artifact_dirs
+        for name in (Path(path).stem, *names)
+    ]
+    artifacts = [candidate for candidate in candidates if candidate.is_file()]
+    if not artifacts:
+        return None
+
+    sources_mtime = max(
+        os.stat(file).st_mtime for file in import_closure(path, search_paths)
+    )
+    expected = {"cairo_lang": CAIRO_LANG_VERSION, "flags": flags}
+    for artifact in artifacts:
+        if artifact.stat().st_mtime < sources_mtime:
+            logger.info(f"{artifact} is stale")
+            continue
+        meta = read_artifact_meta(artifact)
+        if meta != expected:
+            logger.info(f"{artifact} was built with {meta or 'an unknown compiler'}, expected {expected}")
+            continue
+        return artifact
+    logger.info(f"No usable artifact of {path}, compiling it")
+    return None
+
+
+class CompileCache:
+    """
+    On-disk cache of `compile_starknet_files` results.
+
+    Entries are keyed on the hashes of the whole import closure of the
+    contract, the compiler flags and the cairo-lang version, and stored as
+    `ContractClass` JSON. Files are written aside and renamed into place and
+    a contract is compiled by one process at a time, so concurrent
+    pytest-xdist workers can share one cache directory.
+
+    Every time a contract is recompiled because its closure changed, the
+    changed files are logged and kept in `invalidations`.
+
+    Examples
+    ---------
+    >>> cache = CompileCache(".compile_cache")
+    >>> contract_class = cache.compile(path, cairo_path=[...], debug_info=True)
+
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.invalidations = []
+
+    def _write(self, path, data):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(data)
+        os.replace(tmp_path, path)
+
+    def key(self, path, cairo_path, search_paths, **flags):
+        # the same contract reached through `scripts/..` or a symlink has the same key
+        closure = import_closure(path, search_paths)
+        key = hashlib.sha256(json.dumps({
+            "closure": sorted(closure.values()),
+            "cairo_path": [str(Path(directory).resolve()) for directory in cairo_path],
+            "flags": flags,
+            "cairo_lang": CAIRO_LANG_VERSION,
+        }, sort_keys=True).encode()).hexdigest()
+        return key, closure
+
+    def compile(self, path, cairo_path=(), search_paths=None, **flags):
+        """Returns the compiled contract at `path`, from the cache when its closure is unchanged"""
+        if search_paths is None:
+            search_paths = [*cairo_path, os.curdir]
+        path = str(Path(path).resolve())
+        key, closure = self.key(path, cairo_path, search_paths, **flags)
+        name = Path(path).stem
+        entry = self.cache_dir / f"{name}-{key}.json"
+        if entry.is_file():
+            return ContractClass.loads(entry.read_text())
+
+        # workers missing the same entry wait for the first one to compile it
+        with file_lock(self.cache_dir / f"{name}.lock"):
+            if entry.is_file():
+                return ContractClass.loads(entry.read_text())
+
+            self._report_invalidation(path, name, closure)
+            contract_class = compile_starknet_files(
+                files=[path], cairo_path=list(cairo_path), **flags)
+            self._write(entry, contract_class.dumps())
+            self._write(self.cache_dir / f"{name}.manifest.json",
+                        json.dumps({"path": str(path), "key": key, "closure": closure}))
+        return contract_class
+
+    def _report_invalidation(self, path, name, closure):
+        manifest = self.cache_dir / f"{name}.manifest.json"
+        if not manifest.is_file():
+            return
+
+        previous = json.loads(manifest.read_text())
+        if previous["path"] != str(path):
+            return
+        changed = sorted(
+            file for file in set(closure) | set(previous["closure"])
+            if closure.get(file) != previous["closure"].get(file)
+        )
+        reason = ", ".join(
+            changed) if changed else "compiler flags or cairo-lang version"
+        self.invalidations.append((str(path), changed))
+        logger.info(f"Recompiling {path}: {reason} changed")
+        (self.cache_dir / f"{name}-{previous['key']}.json").unlink(missing_ok=True)
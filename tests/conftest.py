@@ -1,16 +1,56 @@
 import pytest
 import pytest_asyncio
 import asyncio
+import random
 from datetime import datetime
 
 from starkware.starknet.testing.starknet import Starknet
 
-from utils import set_block_timestamp
+import referral_deployment
+from resource_profiler import ResourceProfiler, add_resource_options
+from storage_profiler import StorageProfiler, add_storage_options
+from utils import cached_contract, fork_state, get_compile_cache, get_state_snapshots, set_block_timestamp
+
+
+def pytest_addoption(parser):
+    add_resource_options(parser)
+    add_storage_options(parser)
+
+
+def pytest_configure(config):
+    report_path = config.getoption("resources_report")
+    baseline_path = config.getoption("resources_baseline")
+    if report_path or baseline_path:
+        profiler = ResourceProfiler(
+            report_path, baseline_path, config.getoption("resources_threshold"))
+        profiler.install()
+        config.pluginmanager.register(profiler, "resource_profiler")
+    storage_report_path = config.getoption("storage_report")
+    if storage_report_path:
+        profiler = StorageProfiler(storage_report_path)
+        profiler.install()
+        config.pluginmanager.register(profiler, "storage_profiler")
+
+
+def pytest_unconfigure(config):
+    # the profilers patch the same functions over each other, undo it in reverse
+    for name in ("storage_profiler", "resource_profiler"):
+        profiler = config.pluginmanager.get_plugin(name)
+        if profiler is not None:
+            profiler.uninstall()
 
 
 @pytest.fixture(scope='module')
 def event_loop():
-    return asyncio.new_event_loop()
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(autouse=True)
+def seed_random(request):
+    """Seeds `random` per test, results don't depend on the xdist worker running it"""
+    random.seed(request.node.nodeid)
 
 
 @pytest_asyncio.fixture(scope="module")
@@ -20,3 +60,62 @@ async def get_starknet() -> Starknet:
         starknet.state, int(datetime.today().timestamp())
     )
     return starknet
+
+
+@pytest.fixture(scope="session")
+def state_snapshots():
+    return get_state_snapshots()
+
+
+# the referral contract deployment, on which the tests of the test harness run
+
+
+@pytest.fixture(scope="module")
+def referral_contract_defs():
+    return referral_deployment.get_contract_defs()
+
+
+@pytest_asyncio.fixture(scope="module")
+async def referral_contracts_init(referral_contract_defs, get_starknet, state_snapshots):
+    return await state_snapshots.restore_or_deploy(
+        get_starknet, referral_contract_defs, referral_deployment.deploy_contracts)
+
+
+@pytest.fixture
+def referral_contracts_factory(referral_contract_defs, referral_contracts_init, get_starknet):
+    (account_def, referral_def) = referral_contract_defs
+    (deployer_account, admin1_account, referral) = referral_contracts_init
+    _state = fork_state(get_starknet.state)
+
+    return (
+        cached_contract(_state, account_def, deployer_account),
+        cached_contract(_state, account_def, admin1_account),
+        cached_contract(_state, referral_def, referral),
+        _state,
+    )
+
+
+def pytest_sessionfinish(session):
+    # xdist workers hand their invalidations over to the controller
+    compile_cache = get_compile_cache()
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None and compile_cache is not None:
+        workeroutput["compile_cache_invalidations"] = compile_cache.invalidations
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    compile_cache = get_compile_cache()
+    if compile_cache is not None:
+        compile_cache.invalidations.extend(
+            getattr(node, "workeroutput", {}).get("compile_cache_invalidations", []))
+
+
+def pytest_terminal_summary(terminalreporter):
+    compile_cache = get_compile_cache()
+    if compile_cache is None or not compile_cache.invalidations:
+        return
+    terminalreporter.section("compile cache invalidations")
+    for path, changed in compile_cache.invalidations:
+        terminalreporter.write_line(
+            f"{path}: {', '.join(changed) or 'compiler flags or cairo-lang version'} changed")
@@ -0,0 +1,128 @@
+"""Pedersen hashing backends for the merkle helpers."""
+from collections import OrderedDict
+import os
+
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+from process_pool import ChunkedPool
+
+
+def hash_pairs(pairs):
+    """Hashes every (a, b) pair, in order, on the current process"""
+    return [pedersen_hash(a, b) for a, b in pairs]
+
+
+class PedersenPool(ChunkedPool):
+    """
+    Hashes batches of pedersen pairs over a pool of processes.
+
+    Pairs are hashed in chunks by a `ChunkedPool`, results come back in input
+    order so the output is identical to `hash_pairs`. Batches smaller than
+    `min_parallel` are hashed in-process.
+
+    Parameters
+    ----------
+
+    processes : int, defaults to os.cpu_count()
+
+    chunk_size : int
+
+    min_parallel : int
+
+    Examples
+    ---------
+    >>> with PedersenPool() as pool:
+            tree = MerkleTree([leaf[0] for leaf in get_leaves(recipients, amounts, pool)], pool)
+
+    """
+
+    def hash_pairs(self, pairs):
+        return self.map_chunks(hash_pairs, pairs)
+
+
+class PedersenCache:
+    """
+    Bounded LRU cache of pedersen hashes, usable wherever a `PedersenPool` is.
+
+    Hashes of pairs already seen are served from memory, misses are hashed in
+    one batch by `backend` (a `PedersenPool`, or in-process when None). The
+    cache can be saved to and warm-started from a file of fixed-width
+    (a, b, hash) records, so reruns only hash what changed.
+
+    Parameters
+    ----------
+
+    maxsize : int
+
+    path : str, optional, file loaded on creation and written by `save`
+
+    backend : PedersenPool, optional
+
+    Examples
+    ---------
+    >>> cache = PedersenCache(path="pedersen.cache")
+    >>> tree = MerkleTree([leaf[0] for leaf in get_leaves(recipients, amounts, cache)], cache)
+    >>> cache.save()
+    >>> cache.hits, cache.misses
+
+    """
+
+    RECORD_SIZE = 3 * 32
+
+    def __init__(self, maxsize=1_000_000, path=None, backend=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._hashes = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def hash_pairs(self, pairs):
+        pairs = [tuple(pair) for pair in pairs]
+        missing = []
+        for pair in pairs:
+            if pair in self._hashes:
+                self._hashes.move_to_end(pair)
+            else:
+                missing.append(pair)
+
+        missing = list(dict.fromkeys(missing))
+        self.hits += len(pairs) - len(missing)
+        self.misses += len(missing)
+        computed = dict(zip(missing, self.backend.hash_pairs(missing)
+                            if self.backend is not None else hash_pairs(missing)))
+
+        hashes = [computed[pair] if pair in computed else self._hashes[pair]
+                  for pair in pairs]
+        for pair, value in computed.items():
+            self._hashes[pair] = value
+        while len(self._hashes) > self.maxsize:
+            self._hashes.popitem(last=False)
+        return hashes
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        for offset in range(0, len(data), self.RECORD_SIZE):
+            a, b, value = (
+                int.from_bytes(data[i: i + 32], "big")
+                for i in range(offset, offset + self.RECORD_SIZE, 32)
+            )
+            self._hashes[(a, b)] = value
+        while len(self._hashes) > self.maxsize:
+            self._hashes.popitem(last=False)
+
+    def save(self, path=None):
+        """Writes the cache, least recently used first, to `path` or the file it was loaded from"""
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save the pedersen cache to")
+        with open(path, "wb") as f:
+            for (a, b), value in self._hashes.items():
+                f.write(a.to_bytes(32, "big") + b.to_bytes(32, "big") +
+                        value.to_bytes(32, "big"))
@@ -0,0 +1,195 @@
+"""Contracts, accounts and constants of the INO tests, deployed on an in-memory Starknet"""
+from typing import Tuple
+
+from nile.signer import Signer
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+from starkware.starknet.testing.contract import StarknetContract
+
+from signers import MockSigner
+from utils import get_contract_def, get_event_index, to_uint
+
+
+TRUE = 1
+FALSE = 0
+RND_NBR_GEN_SEED = 76823
+ONE_DAY = 24 * 60 * 60
+
+account_path = "openzeppelin/account/presets/Account.cairo"
+ido_factory_path = "IDO/AstralyIDOFactory.cairo"
+ido_path = "mocks/AstralyINOContract_mock.cairo"
+rnd_nbr_gen_path = "utils/xoroshiro128_starstar.cairo"
+erc20_eth_path = "mocks/Astraly_ETH_ERC20_mock.cairo"
+erc721_path = "mocks/Astraly_ERC721_mock.cairo"
+
+deployer = MockSigner(1234321)
+admin1 = MockSigner(2345432)
+staking = MockSigner(3456543)
+sale_owner = MockSigner(4567654)
+sale_participant = MockSigner(5678765)
+sale_participant_2 = MockSigner(678909876)
+
+sig_exp = 3000000000
+
+PARTICIPATION_AMOUNT = to_uint(300 * 10**18)
+MAX_PARTICIPATION = to_uint(5)
+PARTICIPATION_VALUE = to_uint(100 * 10**18)
+
+TOKEN_PRICE = to_uint(100 * 10**18)
+TOKENS_TO_SELL = to_uint(50)
+
+ADMIN_CUT = to_uint(0)
+
+
+def generate_signature(digest, signer: Signer) -> Tuple[int, int]:
+    return signer.sign(message_hash=digest)
+
+
+def sign_registration(
+    signature_expiration_timestamp, user_address, contract_address, signer: Signer
+):
+    digest = pedersen_hash(
+        pedersen_hash(signature_expiration_timestamp,
+                      user_address), contract_address
+    )
+
+    return generate_signature(digest, signer)
+
+
+def get_contract_defs():
+    return tuple(map(get_contract_def, (
+        account_path, ido_factory_path, rnd_nbr_gen_path, ido_path, erc20_eth_path, erc721_path)))
+
+
+async def deploy_contracts(starknet, contract_defs):
+    (
+        account_def,
+        zk_pad_ido_factory_def,
+        rnd_nbr_gen_def,
+        zk_pad_ido_def,
+        erc20_eth_def,
+        erc721_def,
+    ) = contract_defs
+    await starknet.declare(contract_class=account_def)
+    deployer_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[deployer.public_key]
+    )
+    admin1_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[admin1.public_key]
+    )
+
+    staking_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[staking.public_key]
+    )
+    sale_owner_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[
+            sale_owner.public_key]
+    )
+
+    sale_participant_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[
+            sale_participant.public_key]
+    )
+
+    sale_participant_2_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[
+            sale_participant_2.public_key]
+    )
+
+    await starknet.declare(contract_class=rnd_nbr_gen_def)
+    rnd_nbr_gen = await starknet.deploy(
+        contract_class=rnd_nbr_gen_def,
+        constructor_calldata=[RND_NBR_GEN_SEED],
+    )
+
+    ido_class = await starknet.declare(contract_class=zk_pad_ido_def)
+    await starknet.declare(contract_class=zk_pad_ido_factory_def)
+    zk_pad_ido_factory = await starknet.deploy(
+        contract_class=zk_pad_ido_factory_def,
+        constructor_calldata=[deployer_account.contract_address],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        zk_pad_ido_factory.contract_address,
+        "set_ino_contract_class_hash",
+        [ido_class.class_hash],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        zk_pad_ido_factory.contract_address,
+        "set_random_number_generator_address",
+        [rnd_nbr_gen.contract_address],
+    )
+
+    tx = await deployer.send_transaction(
+        deployer_account,
+        zk_pad_ido_factory.contract_address,
+        "create_ino",
+        [admin1_account.contract_address, 0, *ADMIN_CUT],
+    )
+    ido_address = get_event_index(tx).get(zk_pad_ido_factory.contract_address, "INO_Created")[0][1]
+
+    ido = StarknetContract(starknet, zk_pad_ido_def.abi, ido_address, None)
+
+    await starknet.declare(contract_class=erc20_eth_def)
+
+    erc20_eth_token = await starknet.deploy(
+        contract_class=erc20_eth_def,
+        constructor_calldata=[
+            deployer_account.contract_address,
+            deployer_account.contract_address,
+        ],
+    )
+
+    await starknet.declare(contract_class=erc721_def)
+
+    erc721_token = await starknet.deploy(
+        contract_class=erc721_def,
+        constructor_calldata=[
+            deployer_account.contract_address,
+        ],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        erc20_eth_token.contract_address,
+        "transfer",
+        [sale_participant_account.contract_address, *to_uint(50000 * 10**18)],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        erc20_eth_token.contract_address,
+        "transfer",
+        [sale_participant_2_account.contract_address,
+            *to_uint(50000 * 10**18)],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        erc20_eth_token.contract_address,
+        "transfer",
+        [sale_owner_account.contract_address, *TOKENS_TO_SELL],
+    )
+
+    await deployer.send_transaction(
+        deployer_account,
+        zk_pad_ido_factory.contract_address,
+        "set_payment_token_address",
+        [erc20_eth_token.contract_address],
+    )
+
+    return (
+        deployer_account,
+        admin1_account,
+        staking_account,
+        sale_owner_account,
+        sale_participant_account,
+        sale_participant_2_account,
+        rnd_nbr_gen,
+        zk_pad_ido_factory,
+        ido,
+        erc20_eth_token,
+        erc721_token,
+    )
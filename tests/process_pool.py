@@ -0,0 +1,59 @@
+"""Process pool mapping batches in chunks, shared by the hashing and signing pools."""
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+
+class ChunkedPool:
+    """
+    Maps a function over batches of items on a pool of processes.
+
+    Items are split in chunks of `chunk_size` and every chunk is handed to a
+    worker, results come back in input order. Batches smaller than
+    `min_parallel` are mapped in-process, where shipping the items to the
+    workers would cost more than processing them. The workers are started on
+    the first parallel batch and stopped by `close`.
+
+    Parameters
+    ----------
+
+    processes : int, defaults to os.cpu_count()
+
+    chunk_size : int
+
+    min_parallel : int
+
+    """
+
+    def __init__(self, processes=None, chunk_size=2048, min_parallel=4096):
+        self.processes = processes or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def map_chunks(self, function, items):
+        """Returns the concatenated `function(chunk)` of the chunks of `items`, `function` must be picklable"""
+        items = list(items)
+        if self.processes <= 1 or len(items) < self.min_parallel:
+            return function(items)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+
+        chunks = [
+            items[i: i + self.chunk_size] for i in range(0, len(items), self.chunk_size)
+        ]
+        results = []
+        for chunk in self._executor.map(function, chunks):
+            results.extend(chunk)
+        return results
@@ -0,0 +1,42 @@
+"""Contracts, accounts and constants of the referral tests, deployed on an in-memory Starknet"""
+from signers import MockSigner
+from utils import get_contract_def, to_uint
+
+
+account_path = "openzeppelin/account/presets/Account.cairo"
+referral_path = "Referral/AstralyReferral.cairo"
+
+deployer = MockSigner(1234321)
+admin1 = MockSigner(2345432)
+
+REFERRAL_CUT = to_uint(4)  # 25%
+
+
+def get_contract_defs():
+    return tuple(map(get_contract_def, (account_path, referral_path)))
+
+
+async def deploy_contracts(starknet, contract_defs):
+    (
+        account_def,
+        referral_def
+    ) = contract_defs
+    await starknet.declare(contract_class=account_def)
+    deployer_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[deployer.public_key]
+    )
+    admin1_account = await starknet.deploy(
+        contract_class=account_def, constructor_calldata=[admin1.public_key]
+    )
+
+    await starknet.declare(contract_class=referral_def)
+    referral = await starknet.deploy(
+        contract_class=referral_def,
+        constructor_calldata=[admin1_account.contract_address, *REFERRAL_CUT],
+    )
+
+    return (
+        deployer_account,
+        admin1_account,
+        referral
+    )
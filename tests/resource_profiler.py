@@ -0,0 +1,218 @@
+"""pytest plugin aggregating the execution resources of the tests per contract and entry point."""
+import json
+from pathlib import Path
+
+import pytest
+from starkware.starknet.public.abi import get_selector_from_name
+from starkware.starknet.testing.state import StarknetState
+
+from utils import get_contract_name
+
+ENTRY_POINT_TYPES = ("function", "constructor", "l1_handler")
+
+
+def add_resource_options(parser):
+    group = parser.getgroup("resources", "execution resources report")
+    group.addoption("--resources-report", metavar="PATH",
+                    help="write the execution resources per contract and entry point to PATH (JSON) "
+                    "and PATH with a .md suffix (markdown)")
+    group.addoption("--resources-baseline", metavar="PATH",
+                    help="fail when an entry point uses more resources, on average, than in this report")
+    group.addoption("--resources-threshold", type=float, default=0.1,
+                    help="relative increase over --resources-baseline failing the run, 0.1 by default")
+
+
+class ResourceProfiler:
+    """
+    Records the execution resources of every call made by the tests.
+
+    `StarknetState.execute_tx` and `StarknetState.execute_entry_point_raw`
+    are wrapped, they are what `MockSigner.send_transactions`, deployments
+    and `.call()`/`.execute()` end up in. Each call of the call tree of a
+    transaction is added, with the resources of its inner calls, to the
+    totals of its (contract, entry point). Contracts are named after the
+    files `get_contract_def` loaded them from.
+
+    The report is written at the end of the session. With a baseline, the
+    run fails when the mean n_steps or builtin count of an entry point grows
+    by more than `threshold` over it.
+
+    Parameters
+    ----------
+
+    report_path : str, optional
+
+    baseline_path : str, optional
+
+    threshold : float
+
+    """
+
+    def __init__(self, report_path=None, baseline_path=None, threshold=0.1):
+        self.report_path = report_path
+        self.baseline_path = baseline_path
+        self.threshold = threshold
+        self.regressions = []
+        # (contract, entry point) -> totals
+        self.stats = {}
+        # class hash -> (contract name, {selector: entry point name})
+        self._names = {}
+        self._originals = {}
+
+    def install(self):
+        profiler = self
+        execute_tx = StarknetState.execute_tx
+        execute_entry_point_raw = StarknetState.execute_entry_point_raw
+
+        async def profiled_execute_tx(self, tx):
+            execution_info = await execute_tx(self, tx)
+            if execution_info.call_info is not None:
+                await profiler.record(self, execution_info.call_info)
+            return execution_info
+
+        async def profiled_execute_entry_point_raw(self, *args, **kwargs):
+            call_info = await execute_entry_point_raw(self, *args, **kwargs)
+            await profiler.record(self, call_info)
+            return call_info
+
+        self._originals = {"execute_tx": execute_tx,
+                           "execute_entry_point_raw": execute_entry_point_raw}
+        StarknetState.execute_tx = profiled_execute_tx
+        StarknetState.execute_entry_point_raw = profiled_execute_entry_point_raw
+
+    def uninstall(self):
+        for name, method in self._originals.items():
+            setattr(StarknetState, name, method)
+        self._originals = {}
+
+    async def _get_names(self, state, class_hash):
+        if class_hash not in self._names:
+            contract_class = await state.state.get_contract_class(class_hash)
+            self._names[class_hash] = get_class_names(contract_class, class_hash)
+        return self._names[class_hash]
+
+    async def record(self, state, call_info):
+        """Adds the resources of `call_info` and of its inner calls"""
+        pending = [call_info]
+        while pending:
+            call = pending.pop()
+            pending.extend(call.internal_calls)
+            if call.class_hash is None:
+                continue
+            contract, selectors = await self._get_names(state, call.class_hash)
+            entry_point = selectors.get(
+                call.entry_point_selector, hex(call.entry_point_selector))
+            resources = call.execution_resources
+            self.add((contract, entry_point), {
+                "calls": 1,
+                "n_steps": resources.n_steps,
+                "max_n_steps": resources.n_steps,
+                "n_memory_holes": resources.n_memory_holes,
+                "builtins": dict(resources.builtin_instance_counter),
+            })
+
+    def add(self, key, stats):
+        totals = self.stats.setdefault(key, {
+            "calls": 0, "n_steps": 0, "max_n_steps": 0, "n_memory_holes": 0, "builtins": {}})
+        totals["calls"] += stats["calls"]
+        totals["n_steps"] += stats["n_steps"]
+        totals["max_n_steps"] = max(
+            totals["max_n_steps"], stats["max_n_steps"])
+        totals["n_memory_holes"] += stats["n_memory_holes"]
+        for name, count in stats["builtins"].items():
+            totals["builtins"][name] = totals["builtins"].get(name, 0) + count
+
+    def report(self):
+        """Returns {contract: {entry point: resources}}, means are per call"""
+        report = {}
+        for (contract, entry_point), totals in sorted(self.stats.items()):
+            calls = totals["calls"]
+            report.setdefault(contract, {})[entry_point] = {
+                "calls": calls,
+                "mean_n_steps": totals["n_steps"] / calls,
+                "max_n_steps": totals["max_n_steps"],
+                "mean_n_memory_holes": totals["n_memory_holes"] / calls,
+                "mean_builtins": {name: count / calls for name, count in sorted(totals["builtins"].items())},
+            }
+        return report
+
+    def find_regressions(self, report, baseline):
+        regressions = []
+        for contract, entry_points in report.items():
+            for entry_point, resources in entry_points.items():
+                previous = baseline.get(contract, {}).get(entry_point)
+                if previous is None:
+                    continue
+                metrics = [("n_steps", resources["mean_n_steps"], previous["mean_n_steps"])]
+                metrics += [
+                    (name, count, previous["mean_builtins"].get(name, 0))
+                    for name, count in resources["mean_builtins"].items()
+                ]
+                for metric, value, previous_value in metrics:
+                    if value > previous_value * (1 + self.threshold):
+                        regressions.append(
+                            f"{contract}.{entry_point}: {metric} {previous_value:.0f} -> {value:.0f}")
+        return regressions
+
+    def write_report(self, report):
+        path = Path(self.report_path)
+        path.write_text(json.dumps(report, indent=2))
+        path.with_suffix(".md").write_text(to_markdown(report))
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            # xdist workers hand their totals over to the controller
+            workeroutput["resources"] = [
+                [*key, totals] for key, totals in self.stats.items()]
+            return
+
+        report = self.report()
+        if self.report_path:
+            self.write_report(report)
+        if self.baseline_path:
+            baseline = json.loads(Path(self.baseline_path).read_text())
+            self.regressions = self.find_regressions(report, baseline)
+            if self.regressions:
+                session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        for contract, entry_point, totals in getattr(node, "workeroutput", {}).get("resources", []):
+            self.add((contract, entry_point), totals)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.report_path:
+            terminalreporter.write_line(
+                f"execution resources written to {self.report_path}")
+        if self.regressions:
+            terminalreporter.section(
+                f"execution resources regressions over {self.baseline_path}")
+            for regression in self.regressions:
+                terminalreporter.write_line(regression, red=True)
+
+
+def get_class_names(contract_class, class_hash):
+    """Returns the name of the contract and {selector: entry point name} of its ABI"""
+    selectors = {
+        get_selector_from_name(entry["name"]): entry["name"]
+        for entry in contract_class.abi or [] if entry["type"] in ENTRY_POINT_TYPES
+    }
+    name = get_contract_name(contract_class.abi) or f"0x{class_hash.hex()[:8]}"
+    return name, selectors
+
+
+def to_markdown(report):
+    lines = [
+        "| contract | entry point | calls | mean steps | max steps | mean memory holes | mean builtins |",
+        "|---|---|---:|---:|---:|---:|---|",
+    ]
+    for contract, entry_points in report.items():
+        for entry_point, resources in entry_points.items():
+            builtins = ", ".join(f"{name.replace('_builtin', '')} {count:.1f}"
+                                 for name, count in resources["mean_builtins"].items())
+            lines.append(
+                f"| {contract} | {entry_point} | {resources['calls']} | {resources['mean_n_steps']:.0f} "
+                f"| {resources['max_n_steps']} | {resources['mean_n_memory_holes']:.0f} | {builtins} |")
+    return "\n".join(lines) + "\n"
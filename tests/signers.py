@@ -12,8 +12,99 @@ from nile.signer import (
     get_transaction_hash,
     TRANSACTION_VERSION,
 )
+from starkware.crypto.signature.signature import sign
+from starkware.starknet.public.abi import get_selector_from_name
+from process_pool import ChunkedPool
 from utils import to_uint
+from collections import namedtuple
+from functools import cache
 import eth_keys
+import weakref
+
+
+def sign_hashes(items):
+    """Signs every (message_hash, private_key), in order, on the current process"""
+    return [sign(msg_hash=message_hash, priv_key=private_key) for message_hash, private_key in items]
+
+
+class SigningPool(ChunkedPool):
+    """
+    Signs batches of message hashes over a pool of processes.
+
+    Hashes are signed in chunks by a `ChunkedPool`, the (r, s) signatures
+    come back in input order and are the ones `Signer.sign` gives, signing
+    is deterministic. Batches smaller than `min_parallel` are signed
+    in-process.
+
+    Parameters
+    ----------
+
+    processes : int, defaults to os.cpu_count()
+
+    chunk_size : int
+
+    min_parallel : int
+
+    Examples
+    ---------
+    >>> with SigningPool() as pool:
+            signatures = pool.sign(digests, admin.signer.private_key)
+            tx_hash = get_invoke_hash(account.contract_address, calls, nonce)
+            signatures = pool.sign_batch([(tx_hash, participant.signer.private_key), ...])
+
+    """
+
+    def __init__(self, processes=None, chunk_size=64, min_parallel=32):
+        super().__init__(processes, chunk_size, min_parallel)
+
+    def sign(self, message_hashes, private_key):
+        """Signs every hash with one key"""
+        return self.sign_batch((message_hash, private_key) for message_hash in message_hashes)
+
+    def sign_batch(self, items):
+        """Signs every (message_hash, private_key)"""
+        return self.map_chunks(sign_hashes, items)
+
+
+class NonceManager:
+    """
+    Tracks account nonces locally, instead of reading them from the state
+    before every transaction.
+
+    Nonces are kept per `StarknetState`: the first transaction of an account
+    on a state, or on a copy or fork of it, reads its nonce once, the next
+    ones increment it. A failed transaction drops the account nonce, it is
+    read again on the next one. Transactions sent to a tracked account by
+    other means than its signers make the nonce stale, `resync` it then.
+
+    Examples
+    ---------
+    >>> nonces = NonceManager()
+    >>> signer = MockSigner(1234, nonce_manager=nonces)
+
+    """
+
+    def __init__(self):
+        self._nonces = weakref.WeakKeyDictionary()
+
+    async def get_nonce(self, state, address):
+        nonces = self._nonces.setdefault(state, {})
+        if address not in nonces:
+            nonces[address] = await state.state.get_nonce_at(address)
+        return nonces[address]
+
+    def resync(self, state, address):
+        self._nonces.get(state, {}).pop(address, None)
+
+    async def execute_tx(self, state, tx, address, nonce):
+        """Executes `tx`, sent by `address` with `nonce`, and tracks the next nonce of `address`"""
+        try:
+            execution_info = await state.execute_tx(tx=tx)
+        except Exception:
+            self.resync(state, address)
+            raise
+        self._nonces.setdefault(state, {})[address] = nonce + 1
+        return execution_info
 
 
 class MockSigner:
@@ -25,6 +116,9 @@ class MockSigner:
 
     private_key : int
 
+    nonce_manager : NonceManager, optional, tracks the account nonces instead
+        of reading them before each transaction
+
     Examples
     ---------
     Constructing a MockSigner object
@@ -46,11 +140,17 @@ class MockSigner:
             ]
         )
 
+    Sending a call many times, with only its last arguments changing
+
+    >>> call = prepare_call(contract_address, 'contract_method', [arg_1])
+    >>> await signer.send_prepared_calls(account, [call(arg_2)])
+
     """
 
-    def __init__(self, private_key):
+    def __init__(self, private_key, nonce_manager=None):
         self.signer = Signer(private_key)
         self.public_key = self.signer.public_key
+        self.nonce_manager = nonce_manager
 
     async def send_transaction(
         self, account, to, selector_name, calldata, nonce=None, max_fee=0
@@ -62,27 +162,39 @@ class MockSigner:
     async def send_transactions(
         self, account, calls, nonce=None, max_fee=0
     ) -> TransactionExecutionInfo:
-        # hexify address before passing to from_call_to_call_array
-        build_calls = []
-        for call in calls:
-            build_call = list(call)
-            build_call[0] = hex(build_call[0])
-            build_calls.append(build_call)
+        return await self.send_prepared_calls(
+            account, [prepare_call(to, selector_name)(*calldata)
+                      for to, selector_name, calldata in calls], nonce, max_fee
+        )
 
-        raw_invocation = get_raw_invoke(account, build_calls)
-        state = raw_invocation.state
+    async def send_prepared_calls(
+        self, account, calls, nonce=None, max_fee=0, signature=None
+    ) -> TransactionExecutionInfo:
+        """
+        Sends the (to, selector, calldata) calls made by `PreparedCall`s.
+        A `signature` of `get_invoke_hash`, e.g. from a `SigningPool`, is
+        used as is.
+        """
+        state = account.state
+        calldata = get_execute_calldata(calls)
 
         if nonce is None:
-            nonce = await state.state.get_nonce_at(account.contract_address)
-
-        _, sig_r, sig_s = self.signer.sign_transaction(
-            account.contract_address, build_calls, nonce, max_fee
-        )
+            nonce = await get_nonce(state, account.contract_address, self.nonce_manager)
+
+        if signature is None:
+            signature = self.signer.sign(get_transaction_hash(
+                prefix=TransactionHashPrefix.INVOKE,
+                account=account.contract_address,
+                calldata=calldata,
+                nonce=nonce,
+                max_fee=max_fee,
+            ))
+        sig_r, sig_s = signature
 
         # craft invoke and execute tx
         external_tx = InvokeFunction(
             contract_address=account.contract_address,
-            calldata=raw_invocation.calldata,
+            calldata=calldata,
             entry_point_selector=None,
             signature=[sig_r, sig_s],
             max_fee=max_fee,
@@ -93,7 +205,8 @@ class MockSigner:
         tx = InternalTransaction.from_external(
             external_tx=external_tx, general_config=state.general_config
         )
-        execution_info = await state.execute_tx(tx=tx)
+        execution_info = await execute_tx(
+            state, tx, account.contract_address, nonce, self.nonce_manager)
         return execution_info
 
 
@@ -104,11 +217,14 @@ class MockEthSigner:
     ----------
     private_key : int
 
+    nonce_manager : NonceManager, optional
+
     """
 
-    def __init__(self, private_key):
+    def __init__(self, private_key, nonce_manager=None):
         self.signer = eth_keys.keys.PrivateKey(private_key)
         self.eth_address = int(self.signer.public_key.to_checksum_address(), 0)
+        self.nonce_manager = nonce_manager
 
     async def send_transaction(
         self, account, to, selector_name, calldata, nonce=None, max_fee=0
@@ -118,37 +234,46 @@ class MockEthSigner:
         )
 
     async def send_transactions(self, account, calls, nonce=None, max_fee=0):
-        build_calls = []
-        for call in calls:
-            build_call = list(call)
-            build_call[0] = hex(build_call[0])
-            build_calls.append(build_call)
+        return await self.send_prepared_calls(
+            account, [prepare_call(to, selector_name)(*calldata)
+                      for to, selector_name, calldata in calls], nonce, max_fee
+        )
 
-        raw_invocation = get_raw_invoke(account, build_calls)
-        state = raw_invocation.state
+    async def send_prepared_calls(
+        self, account, calls, nonce=None, max_fee=0, signature=None
+    ):
+        """
+        Sends the (to, selector, calldata) calls made by `PreparedCall`s.
+        A (v, r, s) `signature` of `get_invoke_hash` is used as is.
+        """
+        state = account.state
+        calldata = get_execute_calldata(calls)
 
         if nonce is None:
-            nonce = await state.state.get_nonce_at(account.contract_address)
+            nonce = await get_nonce(state, account.contract_address, self.nonce_manager)
 
         transaction_hash = get_transaction_hash(
             prefix=TransactionHashPrefix.INVOKE,
             account=account.contract_address,
-            calldata=raw_invocation.calldata,
+            calldata=calldata,
             nonce=nonce,
             max_fee=max_fee,
         )
 
-        signature = self.signer.sign_msg_hash(
-            (transaction_hash).to_bytes(32, byteorder="big")
-        )
-        sig_r = to_uint(signature.r)
-        sig_s = to_uint(signature.s)
+        if signature is None:
+            signature = self.signer.sign_msg_hash(
+                (transaction_hash).to_bytes(32, byteorder="big")
+            )
+            signature = (signature.v, signature.r, signature.s)
+        v, r, s = signature
+        sig_r = to_uint(r)
+        sig_s = to_uint(s)
 
         external_tx = InvokeFunction(
             contract_address=account.contract_address,
-            calldata=raw_invocation.calldata,
+            calldata=calldata,
             entry_point_selector=None,
-            signature=[signature.v, *sig_r, *sig_s],
+            signature=[v, *sig_r, *sig_s],
             max_fee=max_fee,
             version=TRANSACTION_VERSION,
             nonce=nonce,
@@ -158,9 +283,73 @@ class MockEthSigner:
             external_tx=external_tx, general_config=state.general_config
         )
 
-        execution_info = await state.execute_tx(tx=tx)
+        execution_info = await execute_tx(
+            state, tx, account.contract_address, nonce, self.nonce_manager)
         # the hash and signature are returned for other tests to use
-        return execution_info, transaction_hash, [signature.v, *sig_r, *sig_s]
+        return execution_info, transaction_hash, [v, *sig_r, *sig_s]
+
+
+@cache
+def get_selector(selector_name):
+    return get_selector_from_name(selector_name)
+
+
+class PreparedCall(namedtuple("PreparedCall", ["to", "selector", "calldata"])):
+    """
+    A call to `to` whose selector and leading calldata are computed once.
+
+    Calling it with the remaining arguments returns the (to, selector,
+    calldata) call sent by `send_prepared_calls`, no selector is hashed and
+    no address converted per transaction.
+
+    Examples
+    ---------
+    >>> transfer = prepare_call(token.contract_address, "transfer", [recipient])
+    >>> await signer.send_prepared_calls(account, [transfer(*to_uint(amount))])
+
+    """
+
+    __slots__ = ()
+
+    def __call__(self, *args):
+        return self.to, self.selector, (*self.calldata, *args)
+
+
+def prepare_call(to, selector_name, calldata=()):
+    return PreparedCall(to, get_selector(selector_name), tuple(calldata))
+
+
+def get_execute_calldata(calls):
+    """Returns the calldata of `__execute__` for (to, selector, calldata) calls, as from_call_to_call_array does"""
+    call_array = []
+    calldata = []
+    for to, selector, data in calls:
+        call_array.extend((to, selector, len(calldata), len(data)))
+        calldata.extend(data)
+    return [len(calls), *call_array, len(calldata), *calldata]
+
+
+def get_invoke_hash(address, calls, nonce, max_fee=0):
+    """Returns the hash signed to send (to, selector, calldata) calls from the account at `address`"""
+    return get_transaction_hash(
+        prefix=TransactionHashPrefix.INVOKE,
+        account=address,
+        calldata=get_execute_calldata(calls),
+        nonce=nonce,
+        max_fee=max_fee,
+    )
+
+
+async def get_nonce(state, address, nonce_manager=None):
+    if nonce_manager is None:
+        return await state.state.get_nonce_at(address)
+    return await nonce_manager.get_nonce(state, address)
+
+
+async def execute_tx(state, tx, address, nonce, nonce_manager=None):
+    if nonce_manager is None:
+        return await state.execute_tx(tx=tx)
+    return await nonce_manager.execute_tx(state, tx, address, nonce)
 
 
 def get_raw_invoke(sender, calls):
@@ -0,0 +1,136 @@
+"""Pickled StarknetState snapshots of the deployments made by contracts_init."""
+import ast
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
+from starkware.starknet.testing.contract import StarknetContract
+
+from compile_cache import file_lock
+
+logger = logging.getLogger(__name__)
+
+_root = Path(__file__).resolve().parent.parent
+# where the deployments and the helpers they use live
+MODULE_PATHS = (_root / "tests", _root / "scripts")
+
+
+def python_closure(path, search_paths=MODULE_PATHS):
+    """
+    Returns {file: sha256} for the Python module at `path` and every module
+    of `search_paths` it imports, transitively. Installed packages are left
+    out, cairo-lang is covered by its version in the snapshot key.
+    """
+    closure = {}
+    pending = [str(Path(path).resolve())]
+    while pending:
+        current = pending.pop()
+        if current in closure:
+            continue
+        source = Path(current).read_bytes()
+        closure[current] = hashlib.sha256(source).hexdigest()
+
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                relative = Path(*module.split(".")).with_suffix(".py")
+                for search_path in search_paths:
+                    candidate = Path(search_path) / relative
+                    if candidate.is_file():
+                        pending.append(str(candidate.resolve()))
+                        break
+    return closure
+
+
+class StateSnapshots:
+    """
+    On-disk snapshots of the state left by a deployment function.
+
+    A snapshot is keyed on the digests of the contract classes it deploys,
+    the source of the module defining the deployment and of the helper
+    modules it imports (signers, utils, ...) and the cairo-lang version, so
+    changing a contract or the deployment code redeploys. It holds the
+    pickled `StarknetState` and the deployed contracts as (abi, address),
+    `StarknetContract`s are rebuilt over the restored state.
+
+    Snapshots are saved by one process at a time and renamed into place,
+    pytest-xdist workers can share one directory. With no `snapshot_dir`, deployments always run.
+
+    Examples
+    ---------
+    >>> snapshots = StateSnapshots(".state_snapshots")
+    >>> contracts = await snapshots.restore_or_deploy(starknet, contract_defs, deploy_contracts)
+
+    """
+
+    def __init__(self, snapshot_dir=None):
+        self.snapshot_dir = None
+        if snapshot_dir is not None:
+            self.snapshot_dir = Path(snapshot_dir)
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, contract_defs, deploy):
+        digest = hashlib.sha256(CAIRO_LANG_VERSION.encode())
+        closure = python_closure(inspect.getsourcefile(deploy))
+        for file in sorted(closure):
+            # relative, the key doesn't depend on where the repository is
+            digest.update(f"{Path(file).relative_to(_root)}:{closure[file]}".encode())
+        for contract_def in contract_defs:
+            # dumps() key order changes between runs
+            digest.update(hashlib.sha256(json.dumps(
+                contract_def.dump(), sort_keys=True).encode()).digest())
+        return digest.hexdigest()
+
+    async def restore_or_deploy(self, starknet, contract_defs, deploy):
+        """
+        Restores the snapshot of `await deploy(starknet, contract_defs)` in
+        `starknet`, or runs it and saves its snapshot. The block info of
+        `starknet` is kept.
+        """
+        if self.snapshot_dir is None:
+            return await deploy(starknet, contract_defs)
+
+        name = f"{deploy.__module__}.{deploy.__name__}"
+        path = self.snapshot_dir / \
+            f"{name}-{self.key(contract_defs, deploy)}.pickle"
+        if path.is_file():
+            return self._restore(starknet, path)
+
+        # workers missing the same snapshot wait for the first one to save it
+        with file_lock(self.snapshot_dir / f"{name}.lock"):
+            if path.is_file():
+                return self._restore(starknet, path)
+
+            contracts = await deploy(starknet, contract_defs)
+            logger.info(f"Saving the state snapshot of {name}")
+            frozen = tuple(
+                (contract.abi, contract.contract_address) if isinstance(
+                    contract, StarknetContract) else contract
+                for contract in contracts
+            )
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump((starknet.state, frozen), f)
+            os.replace(tmp_path, path)
+        return contracts
+
+    def _restore(self, starknet, path):
+        with open(path, "rb") as f:
+            state, contracts = pickle.load(f)
+        state.state.block_info = starknet.state.state.block_info
+        starknet.state = state
+        return tuple(
+            StarknetContract(state, *contract, None) if isinstance(
+                contract, tuple) else contract
+            for contract in contracts
+        )
@@ -0,0 +1,190 @@
+"""Steps per Cairo function of the calls run on the in-memory Starknet, from the traces of the VM."""
+import gzip
+from bisect import bisect_right
+from collections import Counter
+
+from starkware.cairo.common.cairo_function_runner import CairoFunctionRunner
+from starkware.cairo.lang.compiler.identifier_definition import FunctionDefinition
+from starkware.cairo.lang.tracer.third_party.profile_pb2 import Profile
+from starkware.starknet.business_logic.execution.execute_entry_point import ExecuteEntryPoint
+
+from resource_profiler import get_class_names
+
+
+class _Call:
+    def __init__(self, functions, stack):
+        # (sorted pcs, function names) of the program of the contract
+        self.functions = functions
+        # frames of the Cairo code making the call, then its entry point
+        self.stack = stack
+        self.runner = None
+        # fp -> frames up to the function using it, they don't change while it runs
+        self._frames = {}
+
+    def function_at(self, pc):
+        pcs, names = self.functions
+        return names[bisect_right(pcs, pc - self.runner.program_base) - 1]
+
+    def frames(self, fp, pc):
+        """Call stack of the Cairo function running at `pc`, with `fp` as frame pointer"""
+        return (*self._callers(fp), self.function_at(pc))
+
+    def _callers(self, fp):
+        if fp == self.runner.initial_fp:
+            return self.stack
+        if fp not in self._frames:
+            memory = self.runner.vm_memory
+            # the caller's fp and the return pc, in the caller, are stored below fp
+            self._frames[fp] = (
+                *self._callers(memory[fp - 2]), self.function_at(memory[fp - 1]))
+        return self._frames[fp]
+
+
+class StepProfiler:
+    """
+    Counts the steps of the calls executed while installed, per Cairo call
+    stack.
+
+    The Cairo VM records the (pc, fp) of every step it runs. After each call,
+    `ExecuteEntryPoint._run` being wrapped, the steps of its trace are
+    attributed to the function at their pc and to the callers found by
+    following the frame pointers, so helpers like `SafeUint256.add` or
+    `uint256_le` get their own frames under the functions calling them.
+    Stacks start with `<contract>.<entry point>`; inner calls are nested
+    under the frames of the Cairo code calling them.
+
+    Use it as a context manager around the transactions to profile, then
+    export the stacks with `write_folded` (flamegraph.pl, speedscope,
+    inferno) or `write_pprof` (`go tool pprof`, `-diff_base` to compare two
+    profiles).
+    """
+
+    def __init__(self):
+        # call stack, root first -> steps
+        self.stacks = Counter()
+        # class hash -> (sorted pcs, function names)
+        self._functions = {}
+        self._calls = []
+        self._originals = {}
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def install(self):
+        profiler = self
+        run = ExecuteEntryPoint._run
+        run_from_entrypoint = CairoFunctionRunner.run_from_entrypoint
+
+        def profiled_run(self, state, *args, **kwargs):
+            profiler._calls.append(profiler._start_call(self, state))
+            try:
+                runner, syscall_handler = run(self, state, *args, **kwargs)
+                profiler._add_trace(profiler._calls[-1])
+            finally:
+                profiler._calls.pop()
+            return runner, syscall_handler
+
+        def profiled_run_from_entrypoint(self, *args, **kwargs):
+            if profiler._calls and profiler._calls[-1].runner is None:
+                profiler._calls[-1].runner = self
+            return run_from_entrypoint(self, *args, **kwargs)
+
+        self._originals = {
+            (ExecuteEntryPoint, "_run"): run,
+            (CairoFunctionRunner, "run_from_entrypoint"): run_from_entrypoint,
+        }
+        ExecuteEntryPoint._run = profiled_run
+        CairoFunctionRunner.run_from_entrypoint = profiled_run_from_entrypoint
+
+    def uninstall(self):
+        for (cls, name), method in self._originals.items():
+            setattr(cls, name, method)
+        self._originals = {}
+
+    def _start_call(self, entry_point, state):
+        class_hash = entry_point._get_code_class_hash(state=state)
+        contract_class = state.get_contract_class(class_hash=class_hash)
+        if class_hash not in self._functions:
+            functions = sorted(
+                (identifier.pc, str(name))
+                for name, identifier in contract_class.program.identifiers.as_dict().items()
+                if isinstance(identifier, FunctionDefinition)
+            )
+            self._functions[class_hash] = ([pc for pc, _ in functions], [
+                name for _, name in functions])
+        contract, selectors = get_class_names(contract_class, class_hash)
+        selector = entry_point.entry_point_selector
+        name = f"{contract}.{selectors.get(selector, hex(selector))}"
+
+        stack = ()
+        if self._calls:
+            # the caller is running the call_contract syscall
+            caller = self._calls[-1]
+            run_context = caller.runner.vm.run_context
+            stack = caller.frames(run_context.fp, run_context.pc)
+        return _Call(self._functions[class_hash], (*stack, name))
+
+    def _add_trace(self, call):
+        for entry in call.runner.vm.trace:
+            self.stacks[call.frames(entry.fp, entry.pc)] += 1
+
+    def functions(self):
+        """
+        Returns {function: (self steps, total steps)}, total steps include the
+        steps of the functions it calls, counted once for recursive calls.
+        """
+        self_steps, total_steps = Counter(), Counter()
+        for stack, steps in self.stacks.items():
+            self_steps[stack[-1]] += steps
+            for frame in set(stack):
+                total_steps[frame] += steps
+        return {frame: (self_steps[frame], total) for frame, total in total_steps.most_common()}
+
+    def write_folded(self, path):
+        """Writes the stacks in the folded format of flamegraph.pl, one `frame;frame;... steps` per line"""
+        with open(path, "w") as f:
+            for stack, steps in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {steps}\n")
+
+    def write_pprof(self, path):
+        """Writes the stacks as a gzipped pprof profile, with steps as sample values"""
+        profile = Profile()
+        strings = {}
+
+        def string_id(string):
+            if string not in strings:
+                strings[string] = len(strings)
+                profile.string_table.append(string)
+            return strings[string]
+
+        string_id("")
+        sample_type = profile.sample_type.add()
+        sample_type.type = string_id("steps")
+        sample_type.unit = string_id("count")
+
+        # one function and one location per frame name, ids start at 1
+        locations = {}
+        for stack in self.stacks:
+            for frame in stack:
+                if frame in locations:
+                    continue
+                locations[frame] = len(locations) + 1
+                function = profile.function.add()
+                function.id = locations[frame]
+                function.name = function.system_name = string_id(frame)
+                location = profile.location.add()
+                location.id = locations[frame]
+                location.line.add().function_id = locations[frame]
+
+        for stack, steps in self.stacks.items():
+            sample = profile.sample.add()
+            # leaf first
+            sample.location_id.extend(locations[frame] for frame in reversed(stack))
+            sample.value.append(steps)
+
+        with open(path, "wb") as f:
+            f.write(gzip.compress(profile.SerializeToString()))
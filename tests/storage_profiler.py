@@ -0,0 +1,310 @@
+"""pytest plugin ranking the entry points called by the tests by the size of their storage diff."""
+import json
+from collections import namedtuple
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+
+import pytest
+from starkware.cairo.lang.compiler.identifier_definition import ConstDefinition
+from starkware.starknet.public.abi import get_storage_var_address
+from starkware.starknet.testing.state import StarknetState
+
+from resource_profiler import get_class_names
+
+UNKNOWN_STORAGE_VAR = "?"
+# loop counters used as keys, e.g. the portions of set_vesting_params
+SMALL_INDEXES = range(32)
+
+StorageVar = namedtuple("StorageVar", ["name", "n_keys", "size"])
+
+
+def add_storage_options(parser):
+    group = parser.getgroup("storage", "storage diff report")
+    group.addoption("--storage-report", metavar="PATH",
+                    help="write the storage diff of the transactions per entry point and storage var to PATH (JSON) "
+                    "and PATH with a .md suffix (markdown), ranked by slots changed")
+
+
+def get_storage_vars(program):
+    """
+    Returns the @storage_var of a compiled contract, with the number of
+    felts of their keys and of their value.
+    """
+    identifiers = {str(name): identifier for name,
+                   identifier in program.identifiers.as_dict().items()}
+    storage_vars = {}
+    for full_name, identifier in identifiers.items():
+        if not full_name.endswith(".addr.Args"):
+            continue
+        namespace = full_name[:-len(".addr.Args")]
+        write_args = identifiers.get(f"{namespace}.write.Args")
+        if write_args is None or f"{namespace}.storage_write" not in identifiers:
+            continue
+        name = namespace.rsplit(".", 1)[-1]
+        storage_vars[name] = StorageVar(
+            name, identifier.size, write_args.size - identifier.size)
+    return list(storage_vars.values())
+
+
+def get_constants(program):
+    """Values of the constants of a compiled contract, but the ones of cairo-lang and the selectors"""
+    values = [
+        identifier.value for name, identifier in program.identifiers.as_dict().items()
+        if isinstance(identifier, ConstDefinition) and not str(name).startswith("starkware.")
+        and not name.path[-1].endswith(("_SELECTOR", "SIZEOF_LOCALS"))
+    ]
+    return list(dict.fromkeys(values))
+
+
+@lru_cache(maxsize=None)
+def _storage_var_address(name, keys):
+    return get_storage_var_address(name, *keys)
+
+
+def get_key_candidates(call_info, values):
+    """
+    Values a transaction may have used as storage var keys: the addresses
+    of its calls, then their calldata, retdata, storage reads and events,
+    and `values`.
+    Returns (addresses, sequences).
+    """
+    addresses = []
+    sequences = [list(values)]
+    pending = [call_info]
+    while pending:
+        call = pending.pop()
+        pending.extend(call.internal_calls)
+        addresses += [call.caller_address, call.contract_address]
+        sequences += [call.calldata, call.retdata, call.storage_read_values]
+        for event in call.events:
+            sequences += [event.keys, event.data]
+    return list(dict.fromkeys(addresses)), sequences
+
+
+def iter_keys(n_keys, addresses, constants, sequences):
+    """
+    Yields the keys to try for a storage var taking `n_keys` felts: any
+    candidate or small index for single keys, otherwise an address or
+    constant followed by addresses (e.g. ERC20 allowances, role members)
+    and runs of consecutive values (e.g. Uint256 keys).
+    """
+    if n_keys == 1:
+        values = addresses + constants + \
+            [value for sequence in sequences for value in sequence] + list(SMALL_INDEXES)
+        yield from ((value,) for value in dict.fromkeys(values))
+        return
+    yield from product(addresses + constants, *[addresses] * (n_keys - 1))
+    for sequence in sequences:
+        for i in range(len(sequence) - n_keys + 1):
+            yield tuple(sequence[i: i + n_keys])
+
+
+def attribute_slots(storage_vars, constants, slots, addresses, sequences):
+    """
+    Returns {slot: storage var name} for the `slots` of a contract, slots
+    that no storage var and candidate key lead to are left out.
+    """
+    unresolved = set(slots)
+    found = {}
+
+    def match(name, keys, size):
+        base = _storage_var_address(name, keys)
+        for offset in range(size):
+            if base + offset in unresolved:
+                unresolved.remove(base + offset)
+                found[base + offset] = name
+
+    for storage_var in sorted(storage_vars, key=lambda var: var.n_keys):
+        if not unresolved:
+            break
+        if storage_var.n_keys == 0:
+            match(storage_var.name, (), storage_var.size)
+            continue
+        for keys in iter_keys(storage_var.n_keys, addresses, constants, sequences):
+            match(storage_var.name, keys, storage_var.size)
+            if not unresolved:
+                break
+    return found
+
+
+class StorageProfiler:
+    """
+    Records the storage diff of every transaction run by the tests.
+
+    `StarknetState.execute_tx` is wrapped to run the transaction on its own
+    layer of the state: the slots it writes, and the values they had
+    before, are read from there before the layer is applied. Slots whose
+    value differs count as changed, they are what the transaction pays for
+    in L1 data availability.
+
+    Each slot is attributed to the @storage_var of the contract it belongs
+    to, by recomputing the addresses of the storage vars with the keys the
+    transaction may have used (see `get_key_candidates`). Transactions are
+    grouped by the entry points they call, the ones of the account
+    `__execute__` for invokes.
+
+    Parameters
+    ----------
+
+    report_path : str, optional
+
+    """
+
+    def __init__(self, report_path=None):
+        self.report_path = report_path
+        # entry point(s) of the transaction -> totals
+        self.stats = {}
+        # class hash -> (contract name, {selector: entry point name}, storage vars, constants)
+        self._classes = {}
+        self._originals = {}
+
+    def install(self):
+        profiler = self
+        execute_tx = StarknetState.execute_tx
+
+        async def profiled_execute_tx(self, tx):
+            parent = self.state
+            self.state = parent._copy()
+            try:
+                execution_info = await execute_tx(self, tx)
+                tx_state = self.state
+            finally:
+                self.state = parent
+            if execution_info.call_info is not None:
+                await profiler.record(parent, tx_state, execution_info)
+            tx_state._apply(parent=parent)
+            return execution_info
+
+        self._originals = {"execute_tx": execute_tx}
+        StarknetState.execute_tx = profiled_execute_tx
+
+    def uninstall(self):
+        for name, method in self._originals.items():
+            setattr(StarknetState, name, method)
+        self._originals = {}
+
+    async def _get_class(self, state, class_hash):
+        if class_hash not in self._classes:
+            contract_class = await state.get_contract_class(class_hash)
+            name, selectors = get_class_names(contract_class, class_hash)
+            self._classes[class_hash] = (
+                name, selectors, get_storage_vars(contract_class.program), get_constants(contract_class.program))
+        return self._classes[class_hash]
+
+    async def _get_entry_point(self, state, call):
+        name, selectors, *_ = await self._get_class(state, call.class_hash)
+        return f"{name}.{selectors.get(call.entry_point_selector, hex(call.entry_point_selector))}"
+
+    async def record(self, parent, tx_state, execution_info):
+        """
+        Adds the storage diff of a transaction, `tx_state` being the state
+        it ran on and `parent` the one it is applied to.
+        """
+        call_info = execution_info.call_info
+        entry_point = await self._get_entry_point(tx_state, call_info)
+        if entry_point.endswith(".__execute__") and call_info.internal_calls:
+            entry_point = "+".join([await self._get_entry_point(tx_state, call)
+                                    for call in call_info.internal_calls])
+
+        writes = tx_state.cache._storage_writes
+        addresses, sequences = get_key_candidates(call_info, writes.values())
+        slots_by_contract = {}
+        for address, key in writes:
+            slots_by_contract.setdefault(address, []).append(key)
+
+        storage_vars = {}
+        for address, slots in slots_by_contract.items():
+            class_hash = await tx_state.get_class_hash_at(address)
+            contract, _, contract_storage_vars, constants = await self._get_class(tx_state, class_hash)
+            names = attribute_slots(
+                contract_storage_vars, constants, slots, addresses, sequences)
+            for key in slots:
+                counts = storage_vars.setdefault(
+                    f"{contract}.{names.get(key, UNKNOWN_STORAGE_VAR)}", {"written": 0, "changed": 0})
+                counts["written"] += 1
+                counts["changed"] += writes[address, key] != await parent.get_storage_at(address, key)
+
+        self.add(entry_point, {
+            "transactions": 1,
+            "l1_gas_usage": execution_info.actual_resources.get("l1_gas_usage", 0),
+            "storage_vars": storage_vars,
+        })
+
+    def add(self, entry_point, stats):
+        totals = self.stats.setdefault(entry_point, {
+            "transactions": 0, "l1_gas_usage": 0, "storage_vars": {}})
+        totals["transactions"] += stats["transactions"]
+        totals["l1_gas_usage"] += stats["l1_gas_usage"]
+        for name, counts in stats["storage_vars"].items():
+            var_totals = totals["storage_vars"].setdefault(
+                name, {"written": 0, "changed": 0})
+            var_totals["written"] += counts["written"]
+            var_totals["changed"] += counts["changed"]
+
+    def report(self):
+        """
+        Returns the entry points by decreasing mean number of slots changed,
+        with their storage vars ranked the same way. Means are per transaction.
+        """
+        report = []
+        for entry_point, totals in self.stats.items():
+            transactions = totals["transactions"]
+            storage_vars = [
+                {"storage_var": name, "mean_slots_written": counts["written"] / transactions,
+                 "mean_slots_changed": counts["changed"] / transactions}
+                for name, counts in totals["storage_vars"].items()
+            ]
+            storage_vars.sort(key=lambda row: (
+                -row["mean_slots_changed"], -row["mean_slots_written"], row["storage_var"]))
+            report.append({
+                "entry_point": entry_point,
+                "transactions": transactions,
+                "mean_slots_written": sum(row["mean_slots_written"] for row in storage_vars),
+                "mean_slots_changed": sum(row["mean_slots_changed"] for row in storage_vars),
+                "mean_l1_gas_usage": totals["l1_gas_usage"] / transactions,
+                "storage_vars": storage_vars,
+            })
+        report.sort(key=lambda row: (
+            -row["mean_slots_changed"], -row["mean_slots_written"], row["entry_point"]))
+        return report
+
+    def write_report(self, report):
+        path = Path(self.report_path)
+        path.write_text(json.dumps(report, indent=2))
+        path.with_suffix(".md").write_text(to_markdown(report))
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            # xdist workers hand their totals over to the controller
+            workeroutput["storage"] = [
+                [entry_point, totals] for entry_point, totals in self.stats.items()]
+            return
+        self.write_report(self.report())
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        for entry_point, totals in getattr(node, "workeroutput", {}).get("storage", []):
+            self.add(entry_point, totals)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_line(
+            f"storage diff written to {self.report_path}")
+
+
+def to_markdown(report):
+    lines = [
+        "| rank | entry point | transactions | mean slots written | mean slots changed | mean L1 gas "
+        "| storage vars (slots written / changed) |",
+        "|---:|---|---:|---:|---:|---:|---|",
+    ]
+    for rank, row in enumerate(report, 1):
+        storage_vars = ", ".join(
+            f"{var['storage_var']} {var['mean_slots_written']:.1f}/{var['mean_slots_changed']:.1f}"
+            for var in row["storage_vars"])
+        lines.append(
+            f"| {rank} | {row['entry_point']} | {row['transactions']} | {row['mean_slots_written']:.1f} "
+            f"| {row['mean_slots_changed']:.1f} | {row['mean_l1_gas_usage']:.0f} | {storage_vars} |")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,77 @@
+import json
+import os
+from pathlib import Path
+
+import compile_cache
+from compile_cache import CompileCache, find_artifact, write_artifact_meta
+from utils import COMPILER_FLAGS, contract_path, get_contract_class
+
+CONTRACT = contract_path("utils/xoroshiro128_starstar.cairo")
+
+VALUE = """%lang starknet
+
+func value() -> felt {{
+    return {};
+}}
+"""
+
+GETTER = """%lang starknet
+
+from value import value
+
+@view
+func get() -> (res: felt) {{
+    let res = value();
+    return (res={});
+}}
+"""
+
+
+def test_find_artifact_checks_the_compiler(tmp_path):
+    artifact = tmp_path / "xoroshiro128_starstar.json"
+    artifact.write_text(get_contract_class("utils/xoroshiro128_starstar.cairo").dumps())
+    search_paths = [str(Path(CONTRACT).parents[2])]
+
+    # built by an unknown compiler
+    assert find_artifact(CONTRACT, search_paths, [tmp_path], **COMPILER_FLAGS) is None
+
+    write_artifact_meta(artifact, disable_hint_validation=True)
+    assert find_artifact(CONTRACT, search_paths, [tmp_path], **COMPILER_FLAGS) == artifact
+    assert find_artifact(CONTRACT, search_paths, [tmp_path], debug_info=True, disable_hint_validation=False) is None
+
+    # stale
+    os.utime(artifact, (0, 0))
+    assert find_artifact(CONTRACT, search_paths, [tmp_path], **COMPILER_FLAGS) is None
+
+
+def test_compile_cache(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "value.cairo").write_text(VALUE.format(1))
+    (src / "getter.cairo").write_text(GETTER.format("res"))
+    compiled = []
+    compile_starknet_files = compile_cache.compile_starknet_files
+    monkeypatch.setattr(compile_cache, "compile_starknet_files",
+                        lambda files, **kwargs: compiled.append(files) or compile_starknet_files(files, **kwargs))
+    cache = CompileCache(tmp_path / "cache")
+
+    def compile(path, cairo_path=src):
+        return cache.compile(str(path), cairo_path=[str(cairo_path)], disable_hint_validation=True)
+
+    contract_class = compile(src / "getter.cairo")
+    # hits, whichever way the paths are spelt
+    assert compile(src / "getter.cairo") == contract_class
+    assert compile(src / ".." / "src" / "getter.cairo", src / ".." / "src") == contract_class
+    assert len(compiled) == 1
+    assert len(list(cache.cache_dir.glob("getter-*.json"))) == 1
+    manifest = json.loads((cache.cache_dir / "getter.manifest.json").read_text())
+    assert manifest["path"] == str((src / "getter.cairo").resolve())
+    assert set(manifest["closure"]) == {str((src / name).resolve()) for name in ("getter.cairo", "value.cairo")}
+
+    # editing an import or the contract recompiles it, replacing the entry
+    for name, source in (("value.cairo", VALUE.format(2)), ("getter.cairo", GETTER.format("res + 1"))):
+        (src / name).write_text(source)
+        assert compile(src / "getter.cairo") != contract_class
+        assert cache.invalidations[-1] == (manifest["path"], [str((src / name).resolve())])
+        assert len(list(cache.cache_dir.glob("getter-*.json"))) == 1
+    assert len(compiled) == 3
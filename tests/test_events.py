@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from starkware.starknet.public.abi import get_selector_from_name
+
+from utils import EventIndex, assert_events_emitted
+
+ADDRESS = 0x123
+TRANSFER = get_selector_from_name("Transfer")
+
+
+class Transaction(SimpleNamespace):
+    """Stands for a TransactionExecutionInfo, which get_event_index references weakly"""
+
+
+def get_call(events, internal_calls=()):
+    call = SimpleNamespace(contract_address=ADDRESS, events=[
+        SimpleNamespace(order=order, keys=[TRANSFER], data=data) for order, data in events])
+    call.gen_call_topology = lambda: [call] + [c for internal in internal_calls for c in internal.gen_call_topology()]
+    return call
+
+
+def test_event_orders_are_local_to_top_level_calls():
+    # __execute__ and the fee transfer both start at order 0
+    execute = get_call([(0, [1])], [get_call([(1, [2])])])
+    fee_transfer = get_call([(0, [3])])
+    tx = Transaction(non_optional_calls=[execute, fee_transfer])
+    index = EventIndex(tx)
+
+    assert len(index) == 3
+    assert index.count(ADDRESS, "Transfer") == 3
+    assert index.get(ADDRESS, "Transfer") == [(1,), (2,), (3,)]
+    assert index.emitted(ADDRESS, "Transfer", [1], 0)
+    assert index.emitted(ADDRESS, "Transfer", [3], 0)
+    assert not index.emitted(ADDRESS, "Transfer", [2], 0)
+    assert_events_emitted(tx, [(0, ADDRESS, "Transfer", [1]), (1, ADDRESS, "Transfer", [2]),
+                               (0, ADDRESS, "Transfer", [3]), (None, ADDRESS, "Transfer", [3])])
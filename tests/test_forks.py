@@ -0,0 +1,41 @@
+import pytest
+
+from utils import ForkedLog, cached_contract, fork_state, to_uint
+from referral_deployment import REFERRAL_CUT, admin1
+
+
+@pytest.mark.asyncio
+async def test_forks_are_isolated(referral_contract_defs, referral_contracts_init, get_starknet):
+    (account_def, referral_def) = referral_contract_defs
+    (_, admin1_account, referral) = referral_contracts_init
+    events = list(get_starknet.state.events)
+    forks = [fork_state(get_starknet.state) for _ in range(2)]
+    admin_account = cached_contract(forks[0], account_def, admin1_account)
+    await admin1.send_transaction(admin_account, referral.contract_address, 'set_referral_cut', [*to_uint(5)])
+
+    # Writes stay in the fork they were made on
+    cuts = [
+        (await cached_contract(fork, referral_def, referral).get_referral_cut().call()).result.res
+        for fork in forks
+    ]
+    assert cuts == [to_uint(5), REFERRAL_CUT]
+    cut = (await cached_contract(get_starknet.state, referral_def, referral).get_referral_cut().call()).result.res
+    assert cut == REFERRAL_CUT
+    assert get_starknet.state.events == events
+    assert forks[0].events[:len(events)] == events
+    assert forks[1].events == events
+
+
+def test_forked_log():
+    base = [1, 2]
+    log = ForkedLog(base)
+    log += [3]
+    log.append(4)
+    assert (len(log), log[-1], log[1:3]) == (4, 4, [2, 3])
+    assert ForkedLog(log) == [1, 2, 3, 4]
+
+    # writes before the end copy the base
+    log[0] = 0
+    del log[1]
+    assert log == [0, 3, 4]
+    assert base == [1, 2]
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from generate_quest_data import build_ido_trees, generateQuestData, get_db, group_by_ido, read_roots, stream_quest_counts
+from hashing import PedersenCache
+from proof_store import ProofStore
+from utils import MerkleTree, get_leaves
+
+
+FIXTURE = Path(__file__).parent / "fixtures" / "quests.json"
+
+# quests done per registered account, 0x999 has no account and IDO 5 isn't asked for
+QUEST_COUNTS = {
+    3: [(0x111, 3), (0x222, 1), (0x333, 2)],
+    4: [(0x222, 2), (0x444, 1)],
+}
+
+
+def test_quest_counts_pipeline():
+    db = get_db(FIXTURE)
+
+    assert group_by_ido(stream_quest_counts(db, [3, 4])) == QUEST_COUNTS
+
+
+def test_generate_quest_data_from_fixture(tmp_path):
+    roots_file = tmp_path / "merkle_roots.txt"
+    generateQuestData([3, 4], FIXTURE, roots_file=roots_file, store_dir=tmp_path)
+
+    roots = []
+    for ido_id, quest_counts in QUEST_COUNTS.items():
+        recipients, amounts = map(list, zip(*quest_counts))
+        leaves = [leaf for leaf, _, _ in get_leaves(recipients, amounts)]
+        tree = MerkleTree(leaves)
+        roots.append(f"IDO_{ido_id}_MERKLE_ROOT={hex(tree.root)}")
+
+        with ProofStore(tmp_path / f"ido_{ido_id}.bin") as store:
+            assert store.root == tree.root
+            assert store.get_levels()[0] == leaves
+            for i, (recipient, amount) in enumerate(quest_counts):
+                assert store.get_amount(recipient) == amount
+                assert store.get_proof(recipient) == tree.proof(i)
+
+    assert roots_file.read_text().splitlines() == roots
+
+
+def test_roots_file_is_merged_by_ido(tmp_path, capsys):
+    roots_file = tmp_path / "merkle_roots.txt"
+    generateQuestData([3, 4], FIXTURE, roots_file=roots_file, store_dir=tmp_path)
+    roots = read_roots(roots_file)
+    roots_file.write_text(roots_file.read_text().replace(hex(roots[4]), "0x4"))
+
+    # IDO 7 has no history
+    generateQuestData([3, 7], FIXTURE, roots_file=roots_file, store_dir=tmp_path)
+
+    assert "no quest history for IDO 7" in capsys.readouterr().err
+    assert read_roots(roots_file) == {3: roots[3], 4: 0x4}
+
+
+def test_generate_quest_data_audit(tmp_path):
+    # IDO 3 has an odd number of accounts, its tree has a padding leaf
+    roots_file = tmp_path / "merkle_roots.txt"
+    generateQuestData([3, 4], FIXTURE, roots_file=roots_file, store_dir=tmp_path, audit=True)
+
+    assert set(read_roots(roots_file)) == {3, 4}
+
+
+def test_build_ido_trees_releases_the_pool():
+    hash_cache = PedersenCache()
+    trees = build_ido_trees(QUEST_COUNTS, processes=2, hash_cache=hash_cache)
+
+    assert [ido_id for ido_id, _, _, _ in trees] == list(QUEST_COUNTS)
+    assert hash_cache.backend is None
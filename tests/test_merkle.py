@@ -0,0 +1,178 @@
+import random
+
+import pytest
+
+from hashing import PedersenCache, PedersenPool
+from proof_store import ProofStore, write_proof_store
+from utils import *
+
+
+RECIPIENTS = [0x1234 + i for i in range(11)]
+AMOUNTS = [i % 4 + 1 for i in range(11)]
+
+
+def get_test_leaves(n):
+    return [leaf for leaf, _, _ in get_leaves(RECIPIENTS[:n], AMOUNTS[:n])]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 11])
+def test_merkle_tree_matches_recursive_helpers(n):
+    leaves = get_test_leaves(n)
+    tree = MerkleTree(leaves)
+
+    assert tree.root == generate_merkle_root(list(leaves))
+    for i in range(len(leaves)):
+        assert tree.proof(i) == generate_merkle_proof(list(leaves), i)
+
+
+def test_merkle_tree_proofs_verify():
+    leaves = get_test_leaves(11)
+    tree = MerkleTree(leaves)
+
+    proofs = tree.proofs()
+    assert len(proofs) == len(leaves)
+    for leaf, proof in zip(leaves, proofs):
+        assert verify_merkle_proof(leaf, proof + [tree.root])
+
+
+def test_merkle_tree_bad_index():
+    tree = MerkleTree(get_test_leaves(3))
+
+    with pytest.raises(IndexError):
+        tree.proof(4)
+    with pytest.raises(ValueError):
+        MerkleTree([])
+
+
+def test_pedersen_pool_matches_serial_hashing():
+    leaves = get_leaves(RECIPIENTS, AMOUNTS)
+
+    with PedersenPool(processes=2, chunk_size=3, min_parallel=0) as pool:
+        assert get_leaves(RECIPIENTS, AMOUNTS, pool) == leaves
+
+        leaf_hashes = [leaf for leaf, _, _ in leaves]
+        tree = MerkleTree(leaf_hashes, pool)
+        assert tree.levels == MerkleTree(leaf_hashes).levels
+
+
+def test_proof_store_lookup(tmp_path):
+    recipients = list(reversed(RECIPIENTS))
+    leaves = get_leaves(recipients, AMOUNTS)
+    tree = MerkleTree([leaf for leaf, _, _ in leaves])
+    path = tmp_path / "ido.bin"
+    write_proof_store(path, tree, recipients, AMOUNTS)
+
+    with ProofStore(path) as store:
+        assert len(store) == len(recipients)
+        assert store.root == tree.root
+        for i, recipient in enumerate(recipients):
+            assert store.get_amount(recipient) == AMOUNTS[i]
+            assert store.get_proof(recipient) == tree.proof(i)
+        assert [address for address, _, _ in store.items()] == sorted(recipients)
+        assert 0x1 not in store
+        assert store.get_proof(0x1) is None
+
+
+def get_full_tree(recipients, amounts):
+    return MerkleTree([leaf for leaf, _, _ in get_leaves(recipients, amounts)])
+
+
+@pytest.mark.parametrize("n", [0, 1, 3])
+def test_incremental_merkle_tree_matches_full_build(tmp_path, n):
+    tree = IncrementalMerkleTree(RECIPIENTS[:n], AMOUNTS[:n])
+    recipients = RECIPIENTS[:n]
+    amounts = AMOUNTS[:n]
+    if n > 0:
+        assert tree.levels == get_full_tree(recipients, amounts).levels
+
+    for new_recipients, new_amounts in [
+        (RECIPIENTS[3:4], AMOUNTS[3:4]),
+        ([RECIPIENTS[0], *RECIPIENTS[4:7]], [9, *AMOUNTS[4:7]]),
+        ([RECIPIENTS[5]], [7]),
+    ]:
+        diff = tree.upsert(new_recipients, new_amounts)
+        for recipient, amount in zip(new_recipients, new_amounts):
+            if recipient in recipients:
+                amounts[recipients.index(recipient)] = amount
+            else:
+                recipients.append(recipient)
+                amounts.append(amount)
+
+        full = get_full_tree(recipients, amounts)
+        assert diff.root == full.root
+        assert tree.levels == full.levels
+        for (level, index), node in diff.nodes.items():
+            assert full.levels[level][index] == node
+        for recipient, proof in tree.diff_proofs(diff).items():
+            assert proof == full.proof(recipients.index(recipient))
+
+    path = tmp_path / "ido.bin"
+    tree.save(path)
+    loaded = IncrementalMerkleTree.load(path)
+    assert loaded.levels == tree.levels
+    assert loaded.recipients == recipients
+    assert loaded.amounts == amounts
+
+
+def test_incremental_merkle_tree_diff_has_every_changed_proof():
+    rng = random.Random(6)
+    for _ in range(40):
+        n = rng.randrange(0, 6)
+        tree = IncrementalMerkleTree(RECIPIENTS[:n], AMOUNTS[:n])
+        for _ in range(3):
+            before = {recipient: tree.proof(i) for i, recipient in enumerate(tree.recipients)}
+            recipients = rng.sample(RECIPIENTS, rng.randrange(1, 4))
+            diff = tree.upsert(recipients, [rng.randrange(1, 4) for _ in recipients])
+
+            after = {recipient: tree.proof(i) for i, recipient in enumerate(tree.recipients)}
+            changed = {recipient: proof for recipient, proof in after.items() if before.get(recipient) != proof}
+            assert tree.diff_proofs(diff) == changed
+            assert tree.root == get_full_tree(tree.recipients, tree.amounts).root
+
+
+def test_verify_all_reports_failing_leaves():
+    leaves = get_test_leaves(11)
+    tree = MerkleTree(leaves)
+    proofs = tree.proofs()
+
+    assert verify_all(leaves, proofs, tree.root) == []
+
+    proofs[3] = proofs[3][:-1] + [proofs[3][-1] + 1]
+    leaves[7] += 1
+    assert verify_all(leaves, proofs, tree.root) == [3, 7]
+
+    with pytest.raises(ValueError):
+        verify_all(leaves, proofs[:-1], tree.root)
+
+
+def test_pedersen_cache_warm_start(tmp_path):
+    leaves = get_test_leaves(11)
+    path = tmp_path / "pedersen.cache"
+
+    cache = PedersenCache(maxsize=100, path=path)
+    assert MerkleTree(leaves, cache).levels == MerkleTree(leaves).levels
+    assert (cache.hits, cache.misses) == (0, len(cache))
+    cache.save()
+
+    warm = PedersenCache(maxsize=100, path=path)
+    assert MerkleTree(leaves, warm).root == MerkleTree(leaves).root
+    assert (warm.hits, warm.misses) == (len(warm), 0)
+
+    with pytest.raises(ValueError):
+        PedersenCache().save()
+
+    small = PedersenCache(maxsize=2, path=path)
+    assert len(small) == 2
+    assert get_leaves(RECIPIENTS, AMOUNTS, small) == get_leaves(RECIPIENTS, AMOUNTS)
+    assert len(small) == 2
+
+
+def test_leaf_columns_match_get_leaves():
+    columns = get_leaf_columns(RECIPIENTS, AMOUNTS)
+    assert list(zip(*columns)) == get_leaves(RECIPIENTS, AMOUNTS)
+
+    with PedersenPool(processes=2, chunk_size=3, min_parallel=0) as pool:
+        assert get_leaf_columns(RECIPIENTS, AMOUNTS, pool) == columns
+
+    low, high = zip(*map(to_uint, RECIPIENTS))
+    assert felts_from_uint_columns(low, high) == RECIPIENTS
@@ -0,0 +1,28 @@
+import pytest
+
+from signers import MockSigner, NonceManager
+from utils import assert_revert, cached_contract, fork_state, to_uint
+from referral_deployment import admin1
+
+
+@pytest.mark.asyncio
+async def test_nonce_manager(referral_contract_defs, referral_contracts_init, get_starknet):
+    (account_def, referral_def) = referral_contract_defs
+    (deployer_account, admin1_account, referral) = referral_contracts_init
+    admin = MockSigner(admin1.signer.private_key, nonce_manager=NonceManager())
+    forks = [fork_state(get_starknet.state) for _ in range(2)]
+    for fork in forks:
+        admin_account = cached_contract(fork, account_def, admin1_account)
+        await admin.send_transaction(admin_account, referral.contract_address, 'set_referral_cut', [*to_uint(5)])
+        # Failed transactions resync the nonce
+        await assert_revert(
+            admin.send_transaction(
+                admin_account,
+                referral.contract_address,
+                "record_referral",
+                [deployer_account.contract_address, deployer_account.contract_address],
+            ),
+            reverted_with="record_referral::self referral is not allowed",
+        )
+        await admin.send_transaction(admin_account, referral.contract_address, 'set_referral_cut', [*to_uint(6)])
+        assert await fork.state.get_nonce_at(admin1_account.contract_address) == 2
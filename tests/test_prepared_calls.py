@@ -0,0 +1,49 @@
+import pytest
+
+from signers import MockEthSigner, get_execute_calldata, get_invoke_hash, prepare_call
+from utils import cached_contract, fork_state, get_contract_def, to_uint
+from referral_deployment import admin1
+
+eth_account_path = "openzeppelin/account/presets/EthAccount.cairo"
+
+eth_signer = MockEthSigner(b"\x01" * 32)
+
+
+@pytest.mark.asyncio
+async def test_prepared_calls(referral_contracts_factory):
+    (deployer_account, admin_account, referral, state) = referral_contracts_factory
+    record_referral = prepare_call(referral.contract_address, "record_referral", [deployer_account.contract_address])
+    set_referral_cut = prepare_call(referral.contract_address, "set_referral_cut")
+    calls = [record_referral(admin_account.contract_address), set_referral_cut(*to_uint(5))]
+
+    # Same calldata as the calls built from names and hex addresses
+    execute_calldata, _, _ = admin1.signer.sign_transaction(admin_account.contract_address, [
+        [hex(referral.contract_address), "record_referral", [deployer_account.contract_address, admin_account.contract_address]],
+        [hex(referral.contract_address), "set_referral_cut", [*to_uint(5)]],
+    ], 0, 0)
+    assert get_execute_calldata(calls) == execute_calldata
+
+    await admin1.send_prepared_calls(admin_account, calls)
+    referrer = (await referral.get_referrer(deployer_account.contract_address).call()).result.res
+    assert referrer == admin_account.contract_address
+    cut = (await referral.get_referral_cut().call()).result.res
+    assert cut == to_uint(5)
+
+
+@pytest.mark.asyncio
+async def test_eth_prepared_calls_signature(referral_contracts_init, get_starknet):
+    (_, _, referral) = referral_contracts_init
+    eth_account_def = get_contract_def(eth_account_path)
+    await get_starknet.declare(contract_class=eth_account_def)
+    eth_account = await get_starknet.deploy(
+        contract_class=eth_account_def, constructor_calldata=[eth_signer.eth_address]
+    )
+    calls = [prepare_call(referral.contract_address, "get_referral_cut")()]
+
+    # A signature made beforehand is sent as is
+    signature = eth_signer.signer.sign_msg_hash(
+        get_invoke_hash(eth_account.contract_address, calls, 0).to_bytes(32, byteorder="big"))
+    account = cached_contract(fork_state(get_starknet.state), eth_account_def, eth_account)
+    _, _, sent = await eth_signer.send_prepared_calls(
+        account, calls, signature=(signature.v, signature.r, signature.s))
+    assert sent == [signature.v, *to_uint(signature.r), *to_uint(signature.s)]
@@ -0,0 +1,107 @@
+import os
+import json
+import asyncio
+import pytest
+
+from proof_server import ProofServer
+from proof_store import write_proof_store
+from utils import MerkleTree, get_leaves
+
+
+RECIPIENTS = [0x1234 + i for i in range(5)]
+AMOUNTS = [1, 2, 3, 4, 5]
+
+
+def write_store(store_dir, ido_id, recipients, amounts):
+    tree = MerkleTree([leaf for leaf, _, _ in get_leaves(recipients, amounts)])
+    write_proof_store(os.path.join(store_dir, f"ido_{ido_id}.bin"),
+                      tree, recipients, amounts)
+    return tree
+
+
+async def request(address, method, path, body=b"", content_length=None):
+    if content_length is None:
+        content_length = len(body)
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.mark.asyncio
+async def test_proof_server(tmp_path):
+    tree = write_store(tmp_path, 3, RECIPIENTS, AMOUNTS)
+    server = ProofServer(tmp_path, reload_interval=3600)
+    address = await server.start("127.0.0.1", 0)
+
+    try:
+        status, payload = await request(address, "GET", f"/ido/3/proof/{hex(RECIPIENTS[1])}")
+        assert status == 200
+        assert payload["root"] == hex(tree.root)
+        assert payload["amount"] == AMOUNTS[1]
+        assert payload["proof"] == list(map(hex, tree.proof(1)))
+
+        status, payload = await request(
+            address, "POST", "/ido/3/proofs",
+            json.dumps({"addresses": [hex(RECIPIENTS[4]), "0x1"]}).encode())
+        assert status == 200
+        assert payload["proofs"][hex(RECIPIENTS[4])]["proof"] == list(
+            map(hex, tree.proof(4)))
+        assert payload["proofs"]["0x1"] is None
+
+        status, _ = await request(address, "GET", "/ido/3/proof/0x1")
+        assert status == 404
+        status, _ = await request(address, "GET", f"/ido/4/proof/{hex(RECIPIENTS[1])}")
+        assert status == 404
+        status, payload = await request(
+            address, "POST", "/ido/9/proofs", json.dumps({"addresses": []}).encode())
+        assert status == 404
+        assert payload == {"error": "Unknown IDO 9"}
+        for content_length in ("-1", "abc"):
+            status, _ = await request(
+                address, "POST", "/ido/3/proofs", content_length=content_length)
+            assert status == 400
+
+        # a new root is published
+        new_tree = write_store(tmp_path, 3, RECIPIENTS, [9] * 5)
+        write_store(tmp_path, 4, RECIPIENTS[:2], AMOUNTS[:2])
+        server.reload()
+
+        status, payload = await request(address, "GET", f"/ido/3/proof/{hex(RECIPIENTS[1])}")
+        assert payload["root"] == hex(new_tree.root)
+        assert payload["amount"] == 9
+        status, _ = await request(address, "GET", f"/ido/4/proof/{hex(RECIPIENTS[1])}")
+        assert status == 200
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_proof_server_polling_survives_broken_stores(tmp_path, caplog):
+    tree = write_store(tmp_path, 3, RECIPIENTS, AMOUNTS)
+    server = ProofServer(tmp_path, reload_interval=0.01)
+    address = await server.start("127.0.0.1", 0)
+
+    async def get_root():
+        status, payload = await request(address, "GET", f"/ido/3/proof/{hex(RECIPIENTS[1])}")
+        assert status == 200
+        return payload["root"]
+
+    try:
+        # a half written store replaces the published one
+        for data in (b"", b"ASTRLYMP", (tmp_path / "ido_3.bin").read_bytes()[:-1]):
+            (tmp_path / "ido_3.tmp").write_bytes(data)
+            os.replace(tmp_path / "ido_3.tmp", tmp_path / "ido_3.bin")
+            await asyncio.sleep(0.1)
+            assert await get_root() == hex(tree.root)
+        assert "Can't open the proof store of IDO 3" in caplog.text
+
+        new_tree = write_store(tmp_path, 3, RECIPIENTS, [9] * 5)
+        await asyncio.sleep(0.1)
+        assert await get_root() == hex(new_tree.root)
+    finally:
+        await server.close()
@@ -5,64 +5,21 @@ from random import randint
 from pprint import pprint as pp
 from typing import Tuple
 
-from signers import MockSigner
 from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
 from starkware.starknet.business_logic.transaction.objects import TransactionExecutionInfo
 
 from utils import *
-from nile.signer import Signer
-
-TRUE = 1
-FALSE = 0
-RND_NBR_GEN_SEED = 76823
-ONE_DAY = 24 * 60 * 60
-
-account_path = "openzeppelin/account/presets/Account.cairo"
-referral_path = "Referral/AstralyReferral.cairo"
-
-deployer = MockSigner(1234321)
-admin1 = MockSigner(2345432)
-
-REFERRAL_CUT = to_uint(4)  # 25%
+from referral_deployment import *
 
 
 @pytest.fixture(scope="module")
 def contract_defs():
-    account_def = get_contract_def(account_path)
-    referral_def = get_contract_def(referral_path)
-
-    return (
-        account_def,
-        referral_def,
-    )
+    return get_contract_defs()
 
 
 @pytest_asyncio.fixture(scope="module")
-async def contracts_init(contract_defs, get_starknet):
-    starknet = get_starknet
-    (
-        account_def,
-        referral_def
-    ) = contract_defs
-    await starknet.declare(contract_class=account_def)
-    deployer_account = await starknet.deploy(
-        contract_class=account_def, constructor_calldata=[deployer.public_key]
-    )
-    admin1_account = await starknet.deploy(
-        contract_class=account_def, constructor_calldata=[admin1.public_key]
-    )
-
-    await starknet.declare(contract_class=referral_def)
-    referral = await starknet.deploy(
-        contract_class=referral_def,
-        constructor_calldata=[admin1_account.contract_address, *REFERRAL_CUT],
-    )
-
-    return (
-        deployer_account,
-        admin1_account,
-        referral
-    )
+async def contracts_init(contract_defs, get_starknet, state_snapshots):
+    return await state_snapshots.restore_or_deploy(get_starknet, contract_defs, deploy_contracts)
 
 
 @pytest.fixture
@@ -76,7 +33,7 @@ def contracts_factory(contract_defs, contracts_init, get_starknet):
         admin1_account,
         referral
     ) = contracts_init
-    _state = get_starknet.state.copy()
+    _state = fork_state(get_starknet.state)
     deployer_cached = cached_contract(_state, account_def, deployer_account)
     admin1_cached = cached_contract(_state, account_def, admin1_account)
     referral_cached = cached_contract(_state, referral_def, referral)
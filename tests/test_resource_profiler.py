@@ -0,0 +1,22 @@
+from resource_profiler import ResourceProfiler, to_markdown
+
+
+def test_report_and_regressions():
+    profiler = ResourceProfiler(threshold=0.1)
+    for n_steps in (100, 300):
+        profiler.add(("AstralyIDOContract_mock", "participate"), {
+            "calls": 1, "n_steps": n_steps, "max_n_steps": n_steps, "n_memory_holes": 2,
+            "builtins": {"range_check_builtin": 10}})
+
+    report = profiler.report()
+    participate = report["AstralyIDOContract_mock"]["participate"]
+    assert participate["calls"] == 2
+    assert participate["mean_n_steps"] == 200
+    assert participate["max_n_steps"] == 300
+    assert participate["mean_builtins"] == {"range_check_builtin": 10}
+    assert "| AstralyIDOContract_mock | participate | 2 | 200 | 300 |" in to_markdown(report)
+
+    baseline = {"AstralyIDOContract_mock": {"participate": {
+        **participate, "mean_n_steps": 190, "mean_builtins": {"range_check_builtin": 5}}}}
+    assert profiler.find_regressions(report, baseline) == [
+        "AstralyIDOContract_mock.participate: range_check_builtin 5 -> 10"]
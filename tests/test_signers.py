@@ -0,0 +1,27 @@
+from nile.signer import Signer
+
+from signers import SigningPool, get_invoke_hash, prepare_call
+from utils import to_uint
+
+PRIVATE_KEY = 2345432
+
+
+def test_signing_pool_matches_signer():
+    signer = Signer(PRIVATE_KEY)
+    digests = list(range(1, 20))
+    with SigningPool(processes=2, chunk_size=3, min_parallel=0) as pool:
+        assert pool.sign(digests, PRIVATE_KEY) == [
+            signer.sign(digest) for digest in digests]
+        assert pool.sign_batch([(digest, PRIVATE_KEY + digest) for digest in digests]) == [
+            Signer(PRIVATE_KEY + digest).sign(digest) for digest in digests]
+
+
+def test_invoke_hash_signature():
+    signer = Signer(PRIVATE_KEY)
+    account_address, to = 0x123, 0x456
+    transfer = prepare_call(to, "transfer", [0x789])
+    tx_hash = get_invoke_hash(account_address, [transfer(*to_uint(10))], 3)
+
+    _, sig_r, sig_s = signer.sign_transaction(
+        account_address, [[hex(to), "transfer", [0x789, *to_uint(10)]]], 3, 0)
+    assert SigningPool(processes=1).sign([tx_hash], PRIVATE_KEY) == [(sig_r, sig_s)]
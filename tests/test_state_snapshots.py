@@ -0,0 +1,15 @@
+from state_snapshots import python_closure
+
+
+def test_python_closure_follows_local_imports(tmp_path):
+    (tmp_path / "deployment.py").write_text("import os\nfrom helpers import deploy\n")
+    (tmp_path / "helpers.py").write_text("import signers\n\n\ndef deploy():\n    pass\n")
+    (tmp_path / "signers.py").write_text("from deployment import *\n")
+    (tmp_path / "unused.py").write_text("")
+
+    closure = python_closure(tmp_path / "deployment.py", [tmp_path])
+    assert sorted(closure) == [str(tmp_path / name) for name in ("deployment.py", "helpers.py", "signers.py")]
+
+    (tmp_path / "signers.py").write_text("from deployment import *\nKEY = 1\n")
+    changed = python_closure(tmp_path / "deployment.py", [tmp_path])
+    assert [file for file in closure if closure[file] != changed[file]] == [str(tmp_path / "signers.py")]
@@ -0,0 +1,23 @@
+import pytest
+
+from step_profiler import StepProfiler
+from utils import to_uint
+from referral_deployment import admin1
+
+
+@pytest.mark.asyncio
+async def test_step_profiler(referral_contracts_factory):
+    (deployer_account, admin_account, referral, state) = referral_contracts_factory
+
+    with StepProfiler() as profiler:
+        tx = await admin1.send_transaction(admin_account, referral.contract_address, "set_referral_cut", [*to_uint(5)])
+
+    n_steps = tx.validate_info.execution_resources.n_steps + tx.call_info.execution_resources.n_steps
+    assert sum(profiler.stacks.values()) == n_steps
+    functions = profiler.functions()
+    assert functions["Account.__execute__"][1] == tx.call_info.execution_resources.n_steps
+    assert functions["AstralyReferral.set_referral_cut"][1] == tx.call_info.internal_calls[0].execution_resources.n_steps
+    # library code nested under the entry point of the inner call
+    assert any(stack[-3:] == ("AstralyReferral.set_referral_cut", "__wrappers__.set_referral_cut",
+                              "__main__.set_referral_cut") for stack in profiler.stacks)
+    assert "contracts.AstralyAccessControl.AstralyAccessControl.assert_only_owner" in functions
@@ -0,0 +1,47 @@
+from starkware.starknet.public.abi import get_storage_var_address
+
+from storage_profiler import StorageProfiler, StorageVar, attribute_slots, to_markdown
+
+SALE = StorageVar("IDO_sale", 0, 19)
+PARTICIPATION = StorageVar("IDO_user_to_participation", 1, 6)
+ALLOWANCES = StorageVar("ERC20_allowances", 2, 2)
+ROLE_MEMBER = StorageVar("AccessControl_role_member", 2, 1)
+OWNER_ROLE = int.from_bytes(b"OWNER", "big")
+
+
+def test_attribute_slots():
+    user, ido = 0x123, 0x456
+    sale = get_storage_var_address("IDO_sale")
+    participation = get_storage_var_address("IDO_user_to_participation", user)
+    allowance = get_storage_var_address("ERC20_allowances", user, ido)
+    role_member = get_storage_var_address("AccessControl_role_member", OWNER_ROLE, user)
+    slots = [sale + 2, sale + 18, participation + 5, allowance, role_member, 42]
+
+    assert attribute_slots([SALE, PARTICIPATION, ALLOWANCES, ROLE_MEMBER], [OWNER_ROLE], slots, [user, ido], [[7, 8]]) == {
+        sale + 2: "IDO_sale",
+        sale + 18: "IDO_sale",
+        participation + 5: "IDO_user_to_participation",
+        allowance: "ERC20_allowances",
+        role_member: "AccessControl_role_member",
+    }
+
+
+def test_report_ranks_by_slots_changed():
+    profiler = StorageProfiler()
+    profiler.add("AstralyIDOContract_mock.register_user", {"transactions": 1, "l1_gas_usage": 100, "storage_vars": {
+        "AstralyIDOContract_mock.IDO_winners_arr": {"written": 4, "changed": 2}}})
+    for changed in (3, 5):
+        profiler.add("AstralyIDOContract_mock.participate", {"transactions": 1, "l1_gas_usage": 200, "storage_vars": {
+            "AstralyIDOContract_mock.IDO_sale": {"written": 19, "changed": changed},
+            "AstralyIDOContract_mock.IDO_participants": {"written": 1, "changed": 1}}})
+
+    report = profiler.report()
+    assert [row["entry_point"] for row in report] == [
+        "AstralyIDOContract_mock.participate", "AstralyIDOContract_mock.register_user"]
+    participate = report[0]
+    assert participate["transactions"] == 2
+    assert participate["mean_slots_written"] == 20
+    assert participate["mean_slots_changed"] == 5
+    assert participate["storage_vars"][0] == {
+        "storage_var": "AstralyIDOContract_mock.IDO_sale", "mean_slots_written": 19, "mean_slots_changed": 4}
+    assert "| 1 | AstralyIDOContract_mock.participate | 2 | 20.0 | 5.0 | 200 |" in to_markdown(report)
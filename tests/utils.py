@@ -1,17 +1,23 @@
 """Utilities for testing Cairo contracts."""
-from collections import namedtuple
+from collections import ChainMap, namedtuple
+from collections.abc import MutableSequence
 from pathlib import Path
 from functools import cache
+import json
 import math
+import os
+import weakref
 
 from starkware.cairo.common.hash_state import compute_hash_on_elements
 from starkware.crypto.signature.signature import private_to_stark_key, sign
-from starkware.starknet.business_logic.state.state import BlockInfo
+from starkware.starknet.business_logic.state.state import BlockInfo, CachedState
 from starkware.starknet.public.abi import get_selector_from_name
 from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.services.api.contract_class import ContractClass
 from starkware.starkware_utils.error_handling import StarkException
 from starkware.starknet.testing.starknet import StarknetContract
-from starkware.starknet.business_logic.execution.objects import Event, OrderedEvent
+from starkware.starknet.testing.state import StarknetState
+from starkware.starknet.business_logic.execution.objects import Event
 from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
 from starkware.starknet.business_logic.transaction.objects import InternalTransaction, TransactionExecutionInfo
 
@@ -19,6 +25,13 @@ from starkware.starknet.business_logic.transaction.objects import InternalTransa
 from nile.utils import felt_to_str, str_to_felt, to_uint, from_uint, add_uint, sub_uint, mul_uint, div_rem_uint, assert_revert
 from nile.signer import Signer
 
+from compile_cache import CompileCache, find_artifact, protostar_contracts
+from hashing import hash_pairs
+from state_snapshots import StateSnapshots
+
+# shared with the scripts, in scripts/
+from proof_store import ProofStore, write_proof_store
+
 MAX_UINT256 = (2**128 - 1, 2**128 - 1)
 INVALID_UINT256 = (MAX_UINT256[0] + 1, MAX_UINT256[1])
 ZERO_ADDRESS = 0
@@ -27,7 +40,10 @@ FALSE = 0
 
 TRANSACTION_VERSION = 0
 
-_root = Path(__file__).parent.parent
+# the step profiler needs the debug info, artifacts must be built with the same flags
+COMPILER_FLAGS = {"debug_info": True, "disable_hint_validation": True}
+
+_root = Path(__file__).resolve().parent.parent
 
 
 def contract_path(name):
@@ -54,47 +70,159 @@ def uint(a):
     return (a, 0)
 
 
+class EventIndex:
+    """
+    Events emitted by a transaction, from every call of its call tree
+    (__validate__, __execute__ and the calls, deploys and constructors they
+    run), by (emitting contract address, event selector).
+
+    Each key holds the (order, data) of its events as emitted. Starknet
+    counts `order` from 0 in each top-level call (__validate__,
+    __execute__, the fee transfer), two events of a key can share it.
+    """
+
+    def __init__(self, tx_exec_info: TransactionExecutionInfo):
+        # (from address, selector) -> [(order, data)], as emitted
+        self.events = {}
+        for call_info in tx_exec_info.non_optional_calls:
+            emitted = []
+            for call in call_info.gen_call_topology():
+                emitted.extend((event.order, call.contract_address, event) for event in call.events if event.keys)
+            for order, from_address, event in sorted(emitted, key=lambda entry: entry[0]):
+                self.events.setdefault((from_address, event.keys[0]), []).append((order, tuple(event.data)))
+        self._data = {key: {data for _, data in events} for key, events in self.events.items()}
+        self._ordered = {key: set(events) for key, events in self.events.items()}
+
+    def __len__(self):
+        return sum(len(events) for events in self.events.values())
+
+    def get(self, from_address, name):
+        """Data of the `name` events emitted by `from_address`, in order"""
+        return [data for _, data in self.events.get((from_address, get_selector_from_name(name)), [])]
+
+    def count(self, from_address, name):
+        return len(self.events.get((from_address, get_selector_from_name(name)), []))
+
+    def emitted(self, from_address, name, data, order=None):
+        """
+        Whether the event was emitted, at position `order` unless None.
+        `order` is local to the top-level call (__validate__, __execute__ or
+        the fee transfer) emitting the event.
+        """
+        key = (from_address, get_selector_from_name(name))
+        if order is None:
+            return tuple(data) in self._data.get(key, ())
+        return (order, tuple(data)) in self._ordered.get(key, ())
+
+
+_event_indexes = {}
+
+
+def get_event_index(tx_exec_info):
+    """The EventIndex of a transaction, built once while it is alive"""
+    key = id(tx_exec_info)
+    if key not in _event_indexes:
+        _event_indexes[key] = EventIndex(tx_exec_info)
+        weakref.finalize(tx_exec_info, _event_indexes.pop, key, None)
+    return _event_indexes[key]
+
+
 def assert_event_emitted(tx_exec_info, from_address, name, data, order=0):
     """Assert one single event is fired with correct data."""
     assert_events_emitted(tx_exec_info, [(order, from_address, name, data)])
 
 
 def assert_events_emitted(tx_exec_info: TransactionExecutionInfo, events):
-    """Assert events are fired with correct data."""
-    for event in events:
-        order, from_address, name, data = event
-        event_obj = OrderedEvent(
-            order=order,
-            keys=[get_selector_from_name(name)],
-            data=data,
-        )
+    """
+    Assert events are fired with correct data, by any call of the
+    transaction. `events` are (order, from_address, name, data), order
+    being the position of the event in the top-level call (__validate__,
+    __execute__ or the fee transfer) emitting it, None for any.
+    """
+    index = get_event_index(tx_exec_info)
+    for order, from_address, name, data in events:
+        if not index.emitted(from_address, name, data, order):
+            raise BaseException(f"Event {name} not fired or not fired correctly")
 
-        base = tx_exec_info.call_info.internal_calls[0]
-        if event_obj in base.events and from_address == base.contract_address:
-            return
 
-        try:
-            base2 = base.internal_calls[0]
-            if event_obj in base2.events and from_address == base2.contract_address:
-                return
-        except IndexError:
-            pass
+@cache
+def get_compile_cache():
+    """Returns the on-disk compile cache, None when COMPILE_CACHE_DIR is set empty"""
+    cache_dir = os.getenv("COMPILE_CACHE_DIR", str(_root / ".compile_cache"))
+    if not cache_dir:
+        return None
+    return CompileCache(cache_dir)
 
-        raise BaseException("Event not fired or not fired correctly")
+
+@cache
+def get_state_snapshots():
+    """Returns the contracts_init state snapshots, always redeploying when STATE_SNAPSHOT_DIR is set empty"""
+    snapshot_dir = os.getenv(
+        "STATE_SNAPSHOT_DIR", str(_root / ".state_snapshots"))
+    return StateSnapshots(snapshot_dir or None)
+
+
+@cache
+def get_protostar_contracts():
+    return protostar_contracts(_root / "protostar.toml")
+
+
+# file name of every contract loaded by get_contract_def, by ABI
+_contract_names = {}
 
 
 @cache
 def get_contract_def(path):
     """Returns the contract definition from the contract path"""
+    contract_def = load_contract_def(path)
+    _contract_names[json.dumps(contract_def.abi, sort_keys=True)] = Path(path).stem
+    return contract_def
+
+
+def get_contract_name(abi):
+    """Returns the file name of the contract with this ABI, None when it wasn't loaded by get_contract_def"""
+    return _contract_names.get(json.dumps(abi, sort_keys=True))
+
+
+def load_contract_def(path):
+    """
+    Loads the contract definition from the contract path.
+
+    With USE_ARTIFACTS set, the nile/protostar artifact of the contract is
+    loaded instead when it is fresh. Otherwise the contract is compiled,
+    through the on-disk compile cache.
+    """
     path = contract_path(path)
+    cairo_path = [
+        str(_root / "lib/cairo_contracts/src"),
+        str(_root / "lib/starknet_attestations"),
+    ]
+    search_paths = [*cairo_path, str(_root)]
+    if os.getenv("USE_ARTIFACTS"):
+        name = get_protostar_contracts().get(str(Path(path).resolve()))
+        artifact = find_artifact(
+            path,
+            search_paths,
+            [_root / "build", _root / "artifacts"],
+            names=[name] if name else [],
+            **COMPILER_FLAGS,
+        )
+        if artifact is not None:
+            return ContractClass.loads(artifact.read_text())
+
+    compile_cache = get_compile_cache()
+    if compile_cache is not None:
+        return compile_cache.compile(
+            path,
+            cairo_path=cairo_path,
+            search_paths=search_paths,
+            **COMPILER_FLAGS,
+        )
+
     contract_def = compile_starknet_files(
         files=[path],
-        debug_info=True,
-        cairo_path=[
-            str(_root / "lib/cairo_contracts/src"),
-            str(_root / "lib/starknet_attestations"),
-        ],
-        disable_hint_validation=True,
+        cairo_path=cairo_path,
+        **COMPILER_FLAGS,
     )
     return contract_def
 
@@ -110,6 +238,85 @@ def cached_contract(state, definition, deployed):
     return contract
 
 
+class ForkedLog(MutableSequence):
+    """
+    List of the entries of `base` followed by its own, `base` is only read.
+
+    Appending, as StarknetState does with its events and messages, is
+    constant time. Any other write copies `base` first.
+    """
+
+    def __init__(self, base):
+        self._base = base
+        self._items = []
+
+    def __len__(self):
+        return len(self._base) + len(self._items)
+
+    def __iter__(self):
+        yield from self._base
+        yield from self._items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index < len(self._base):
+            return self._base[index]
+        return self._items[index - len(self._base)]
+
+    def _own(self):
+        if self._base:
+            self._items = [*self._base, *self._items]
+            self._base = []
+
+    def __setitem__(self, index, value):
+        self._own()
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        self._own()
+        del self._items[index]
+
+    def insert(self, index, value):
+        if index >= len(self):
+            self._items.append(value)
+        else:
+            self._own()
+            self._items.insert(index, value)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def fork_state(starknet_state):
+    """
+    Returns a copy-on-write fork of `starknet_state`, in constant time.
+
+    Reads fall through to `starknet_state`, writes stay in the fork. Unlike
+    `StarknetState.copy`, nothing is copied, the events and L2 to L1
+    messages included, so `starknet_state` must not be written to while its
+    forks are in use.
+    """
+    fork = StarknetState(
+        state=CachedState(
+            block_info=starknet_state.state.block_info,
+            state_reader=starknet_state.state,
+        ),
+        general_config=starknet_state.general_config,
+    )
+    fork._l2_to_l1_messages = ChainMap({}, starknet_state._l2_to_l1_messages)
+    fork.l2_to_l1_messages_log = ForkedLog(starknet_state.l2_to_l1_messages_log)
+    fork.events = ForkedLog(starknet_state.events)
+    return fork
+
+
 def get_block_timestamp(starknet_state):
     return starknet_state.state.block_info.block_timestamp
 
@@ -163,19 +370,19 @@ def uarr2cd(arr):
     return acc
 
 
-def get_next_level(level):
-    next_level = []
+def get_next_level(level, pool=None):
+    """Hashes the sorted pairs of `level`, optionally on a `PedersenPool` or `PedersenCache`"""
+    pairs = []
 
     for i in range(0, len(level), 2):
-        node = 0
         if level[i] < level[i + 1]:
-            node = pedersen_hash(level[i], level[i + 1])
+            pairs.append((level[i], level[i + 1]))
         else:
-            node = pedersen_hash(level[i + 1], level[i])
-
-        next_level.append(node)
+            pairs.append((level[i + 1], level[i]))
 
-    return next_level
+    if pool is not None:
+        return pool.hash_pairs(pairs)
+    return hash_pairs(pairs)
 
 
 def generate_proof_helper(level, index, proof):
@@ -227,6 +434,87 @@ def verify_merkle_proof(leaf, proof):
     return curr == root
 
 
+def verify_all(leaves, proofs, root):
+    """
+    Verifies many proofs against `root`, returns the indexes of the failing leaves.
+
+    Proofs are sibling paths as returned by `MerkleTree.proof`. Paths of a
+    same tree share their upper nodes, every (node, sibling) pair is hashed
+    once and reused, so auditing all proofs costs about one tree build.
+    """
+    if len(leaves) != len(proofs):
+        raise ValueError(f"{len(leaves)} leaves but {len(proofs)} proofs")
+
+    hashes = {}
+    failing = []
+    for i, (leaf, proof) in enumerate(zip(leaves, proofs)):
+        curr = leaf
+        for proof_elem in proof:
+            pair = (curr, proof_elem) if curr < proof_elem else (
+                proof_elem, curr)
+            node = hashes.get(pair)
+            if node is None:
+                node = pedersen_hash(*pair)
+                hashes[pair] = node
+            curr = node
+
+        if curr != root:
+            failing.append(i)
+
+    return failing
+
+
+class MerkleTree:
+    """
+    Merkle tree hashed once, level by level, keeping every level around.
+
+    Levels follow `get_next_level` semantics (sorted pairs, odd levels padded
+    with 0), so `root` and `proof` match `generate_merkle_root` and
+    `generate_merkle_proof` without rebuilding the tree for each leaf.
+
+    Examples
+    ---------
+    >>> tree = MerkleTree([leaf[0] for leaf in get_leaves(recipients, amounts)])
+    >>> tree.root
+    >>> tree.proof(0)
+
+    Passing a `PedersenPool` hashes every level over its processes, a
+    `PedersenCache` reuses the hashes of previous builds.
+    """
+
+    def __init__(self, leaves, pool=None):
+        if len(leaves) == 0:
+            raise ValueError("Cannot build a merkle tree without leaves")
+
+        self.size = len(leaves)
+        level = list(leaves)
+        self.levels = [level]
+        while len(level) > 1:
+            if len(level) % 2 != 0:
+                level.append(0)
+            level = get_next_level(level, pool)
+            self.levels.append(level)
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    def proof(self, index):
+        """Returns the sibling path of the leaf at `index`, from the bottom up"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"Leaf index {index} out of range")
+
+        proof = []
+        for level in self.levels[:-1]:
+            proof.append(level[index ^ 1])
+            index //= 2
+        return proof
+
+    def proofs(self):
+        """Returns the proofs of all leaves, in leaf order"""
+        return [self.proof(i) for i in range(self.size)]
+
+
 def get_leaf(recipient, amount):
     # amount_hash = pedersen_hash(amount, 0)
     leaf = pedersen_hash(recipient, amount)
@@ -236,11 +524,16 @@ def get_leaf(recipient, amount):
 # creates the inital merkle leaf values to use
 
 
-def get_leaves(recipients, amounts):
+def get_leaves(recipients, amounts, pool=None):
+    if pool is not None:
+        leaves = pool.hash_pairs(zip(recipients, amounts))
+    else:
+        leaves = [get_leaf(recipients[i], amounts[i])
+                  for i in range(0, len(recipients))]
+
     values = []
     for i in range(0, len(recipients)):
-        leaf = get_leaf(recipients[i], amounts[i])
-        value = (leaf, recipients[i], amounts[i])
+        value = (leaves[i], recipients[i], amounts[i])
         values.append(value)
 
     if len(values) % 2 != 0:
@@ -248,3 +541,179 @@ def get_leaves(recipients, amounts):
         values.append(last_value)
 
     return values
+
+
+LeafColumns = namedtuple("LeafColumns", ["leaves", "recipients", "amounts"])
+
+
+def get_leaf_columns(recipients, amounts, pool=None):
+    """
+    Columnar `get_leaves`: returns the leaves, recipients and amounts as three
+    parallel lists instead of one tuple per row, padded with the same 0
+    sentinel. Inputs can be any sequences of ints, e.g. numpy object arrays;
+    felts split in uint256 limbs can be joined with `felts_from_uint_columns`.
+    """
+    recipients = list(map(int, recipients))
+    amounts = list(map(int, amounts))
+    if pool is not None:
+        leaves = pool.hash_pairs(zip(recipients, amounts))
+    else:
+        leaves = list(map(pedersen_hash, recipients, amounts))
+
+    if len(leaves) % 2 != 0:
+        for column in (leaves, recipients, amounts):
+            column.append(0)
+
+    return LeafColumns(leaves, recipients, amounts)
+
+
+def felts_from_uint_columns(low, high):
+    """Joins columns of (low, high) 128-bit limbs back into felts"""
+    return [int(lo) | (int(hi) << 128) for lo, hi in zip(low, high)]
+
+
+MerkleDiff = namedtuple("MerkleDiff", ["root", "nodes", "leaves", "added"])
+
+
+class IncrementalMerkleTree(MerkleTree):
+    """
+    Append-only `MerkleTree` of (recipient, amount) leaves.
+
+    New recipients are appended after the existing leaves and known ones get
+    their amount updated in place. Only the nodes above changed leaves are
+    rehashed, so `upsert` of k entries costs O(k log n) hashes. Each call
+    returns a `MerkleDiff` with the new root, the (level, index) -> value of
+    every node written, the touched leaf indices and the appended ones. Leaves are padded like
+    `get_leaves`, roots and proofs match a full build of the same entries.
+
+    The tree is persisted with `save`/`load` as a `ProofStore` file, which
+    keeps every level and not only the right frontier: updating an existing
+    leaf needs its siblings.
+
+    Examples
+    ---------
+    >>> tree = IncrementalMerkleTree.load("ido_3.bin")
+    >>> diff = tree.upsert([address], [nb_quest])
+    >>> tree.save("ido_3.bin")
+    """
+
+    def __init__(self, recipients=(), amounts=(), pool=None):
+        self.recipients = list(recipients)
+        self.amounts = list(amounts)
+        self._index = {recipient: i for i,
+                       recipient in enumerate(self.recipients)}
+        if len(self._index) != len(self.recipients):
+            raise ValueError("Recipients must be unique")
+
+        self.pool = pool
+        self.levels = [[]]
+        if self.recipients:
+            # padded like get_leaves, a single recipient is hashed with the 0 leaf
+            leaves = get_leaf_columns(
+                self.recipients, self.amounts, pool).leaves
+            MerkleTree.__init__(self, leaves, pool)
+        self.size = len(self.recipients)
+
+    @property
+    def root(self):
+        return self.levels[-1][0] if self.size > 0 else None
+
+    def upsert(self, recipients, amounts):
+        """Appends new recipients and updates the amount of known ones"""
+        size = len(self.recipients)
+        updates = {}
+        for recipient, amount in zip(recipients, amounts):
+            index = self._index.get(recipient)
+            if index is None:
+                index = len(self.recipients)
+                self._index[recipient] = index
+                self.recipients.append(recipient)
+                self.amounts.append(amount)
+            elif self.amounts[index] == amount:
+                continue
+            else:
+                self.amounts[index] = amount
+            updates[index] = (recipient, amount)
+
+        leaves = self.levels[0]
+        if updates:
+            indexes = sorted(updates)
+            pairs = [updates[i] for i in indexes]
+            hashes = self.pool.hash_pairs(
+                pairs) if self.pool is not None else hash_pairs(pairs)
+            self.size = len(self.recipients)
+            leaves.extend([0] * (self.size - len(leaves)))
+            for i, leaf in zip(indexes, hashes):
+                leaves[i] = leaf
+
+        nodes = self._rehash(set(updates))
+        return MerkleDiff(root=self.root, nodes=nodes, leaves=sorted(updates),
+                          added=list(range(size, len(self.recipients))))
+
+    def _rehash(self, changed):
+        nodes = {}
+        size = self.size
+        depth = 0
+        while size > 0:
+            level = self.levels[depth]
+            # leaves are always paired, upper levels stop at a single node
+            if size % 2 != 0 and (depth == 0 or size > 1):
+                if len(level) == size:
+                    level.append(0)
+                    changed.add(size)
+            else:
+                del level[size:]
+
+            for i in changed:
+                nodes[(depth, i)] = level[i]
+            if len(level) == 1:
+                break
+
+            parents = sorted({i // 2 for i in changed})
+            pairs = [sorted((level[2 * p], level[2 * p + 1])) for p in parents]
+            hashes = self.pool.hash_pairs(
+                pairs) if self.pool is not None else hash_pairs(pairs)
+
+            if depth + 1 == len(self.levels):
+                self.levels.append([])
+            next_level = self.levels[depth + 1]
+            size = len(level) // 2
+            next_level.extend([0] * (size - len(next_level)))
+            for p, node in zip(parents, hashes):
+                next_level[p] = node
+
+            changed = set(parents)
+            depth += 1
+
+        del self.levels[depth + 1:]
+        return nodes
+
+    def diff_proofs(self, diff):
+        """
+        Returns the new proof of every leaf whose proof changed with `diff`, by
+        recipient: the appended leaves and the leaves under the sibling of any
+        node written below the root.
+        """
+        indexes = set(diff.added)
+        for level, index in diff.nodes:
+            if level + 1 < len(self.levels):
+                sibling = index ^ 1
+                indexes.update(range(sibling << level, min((sibling + 1) << level, self.size)))
+        return {self.recipients[i]: self.proof(i) for i in sorted(indexes)}
+
+    def save(self, path):
+        write_proof_store(path, self, self.recipients, self.amounts)
+
+    @classmethod
+    def load(cls, path, pool=None):
+        tree = cls(pool=pool)
+        with ProofStore(path) as store:
+            entries = sorted(store.entries(), key=lambda entry: entry[2])
+            tree.levels = store.get_levels()
+
+        tree.recipients = [address for address, _, _ in entries]
+        tree.amounts = [amount for _, amount, _ in entries]
+        tree._index = {recipient: i for i,
+                       recipient in enumerate(tree.recipients)}
+        tree.size = len(tree.recipients)
+        return tree